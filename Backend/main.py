@@ -1,4 +1,4 @@
-from fastapi import FastAPI, UploadFile, Response
+from fastapi import FastAPI, UploadFile, Response, Header, Depends
 from urllib3.response import HTTPResponse
 from .modules.stars.services import load_around_position, load_around_id
 from .modules.stars.models import (
@@ -7,14 +7,38 @@ from .modules.stars.models import (
     SurroundingsPosResponse,
     SurroundingsIdResponse,
 )
-from .modules.exoplanets.services import find_exoplanets_by_name, find_some_exoplanets
-from .modules.exoplanets.models import ExoplanetsByNameRequest, RequestExoplanets
-from .modules.input.models import InputResponse
-from .modules.input.services import process_input
+from .modules.exoplanets.services import (
+    find_exoplanets_by_name,
+    find_some_exoplanets,
+    find_exoplanets_bulk,
+)
+from .modules.exoplanets.catalog import start_catalog_sync
+from .modules.exoplanets.galaxy_map import get_galaxy_map
+from .modules.exoplanets.models import (
+    ExoplanetsByNameRequest,
+    ExoplanetsBulkRequest,
+    RequestExoplanets,
+)
+from .modules.input.models import (
+    InputResponse,
+    InputMetricsResponse,
+    DebugDumpResponse,
+    FrameFormat,
+    LandmarksRequest,
+)
+from .modules.input.services import (
+    process_input,
+    process_frame,
+    process_landmarks,
+    dropped_response,
+    get_input_metrics,
+    dump_debug_frames,
+)
+from .modules.input.shm import stop_inference_processes
 from .modules.users.models import (
     ConstellationsResponse,
+    CompactConstellationsResponse,
     ActiveConstellationsRequest,
-    ConstellationsResponse,
     CreateConstellationRequest,
     CreateConstellationResponse,
 )
@@ -23,11 +47,12 @@ from .modules.users.services import (
     getAllConstellationsByUser,
     getActiveConstellationsByUser,
 )
-from supabase import create_client, Client, ClientOptions, AClient
+from .modules.users.client import start_supabase, stop_supabase, get_auth_client
 from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse
 from fastapi.security import OAuth2AuthorizationCodeBearer
-import os, json
+import os, json, asyncio, uuid
+from typing import Literal
 from dotenv import load_dotenv
 
 
@@ -38,20 +63,28 @@ language = "es"
 error = False
 error_message = ""
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
 active_websockets = {}
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(
-    flow_type="pkce"
-))
+
+@app.on_event("startup")
+async def startup():
+    await start_supabase()
+    start_catalog_sync()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    stop_inference_processes()
+    await stop_supabase()
 
 
 @app.post("/load_surroundings")
 async def load_surroundings(request: SurroundingsPosRequest) -> SurroundingsPosResponse:
-    stars = await load_around_position(request.ra, request.dec, request.dist)
+    stars = await load_around_position(
+        request.ra, request.dec, request.dist, annotate_hosts=request.annotate_hosts
+    )
     return SurroundingsPosResponse(stars=stars)
 
 
@@ -59,7 +92,9 @@ async def load_surroundings(request: SurroundingsPosRequest) -> SurroundingsPosR
 async def load_surroundings_by_id(
     request: SurroundingsIdRequest,
 ) -> SurroundingsIdResponse:
-    stars, name, ra, dec, dist = await load_around_id(request.id)
+    stars, name, ra, dec, dist = await load_around_id(
+        request.id, annotate_hosts=request.annotate_hosts
+    )
     return SurroundingsIdResponse(stars=stars, name=name, ra=ra, dec=dec, dist=dist)
 
 
@@ -71,6 +106,12 @@ async def get_exoplanets_by_name(
     return JSONResponse(content=exoplanets, status_code=200)
 
 
+@app.post("/get_exoplanets_bulk")
+async def get_exoplanets_bulk(request: ExoplanetsBulkRequest) -> JSONResponse:
+    exoplanets: str = await find_exoplanets_bulk(request.keys, request.by)
+    return JSONResponse(content=exoplanets, status_code=200)
+
+
 @app.post("/get_some_exoplanets")
 async def get_some_exoplanets(request: RequestExoplanets):
     if request.index==None or not request.amount:
@@ -81,10 +122,99 @@ async def get_some_exoplanets(request: RequestExoplanets):
     return JSONResponse(content=exoplanets, status_code=200)
 
 
+@app.get("/galaxy_map")
+async def galaxy_map(request: Request, v: str | None = None) -> Response:
+    galaxy = get_galaxy_map()
+    if v == galaxy["version"]:
+        # Versioned URLs never change content
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = "no-cache"
+    headers = {
+        "ETag": galaxy["etag"],
+        "Cache-Control": cache_control,
+        "X-Catalog-Version": galaxy["version"],
+    }
+    if request.headers.get("if-none-match") == galaxy["etag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=galaxy["blob"], media_type="application/octet-stream", headers=headers)
+
+
 @app.post("/get_action")
-async def get_action(file: UploadFile) -> InputResponse:
-    cursor, r_gesture, rotation, zoom = await process_input(file)
-    return InputResponse(cursor=cursor, right_gesture=r_gesture, rotation=rotation, zoom=zoom)
+async def get_action(
+    file: UploadFile,
+    x_session_id: str = Header("default"),
+    x_frame_timestamp: float | None = Header(None),
+    x_frame_seq: int | None = Header(None),
+    frame_format: FrameFormat = Depends(),
+) -> InputResponse:
+    return await process_input(file, x_session_id, frame_format, x_frame_timestamp, x_frame_seq)
+
+@app.post("/get_action_landmarks")
+async def get_action_landmarks(request: LandmarksRequest) -> InputResponse:
+    return await process_landmarks(request)
+
+
+@app.get("/input_metrics")
+async def input_metrics() -> InputMetricsResponse:
+    return get_input_metrics()
+
+
+@app.post("/debug/dump_frames")
+async def debug_dump_frames(x_admin_token: str = Header("")) -> DebugDumpResponse:
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return await dump_debug_frames()
+
+
+@app.websocket("/gesture_stream")
+async def gesture_stream(
+    websocket: WebSocket, session_id: str | None = None, frame_format: FrameFormat = Depends()
+):
+    # Connections without an id get their own session, two of them must not share trackers and frames
+    session_id = session_id or uuid.uuid4().hex
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+
+    async def answer(frame: bytes, seq: int):
+        try:
+            response = await process_frame(frame, session_id, frame_format, seq=seq)
+        except HTTPException as e:
+            if e.status_code == 503:
+                # Workers are saturated, the frame is answered as dropped like a stale one
+                response = dropped_response(seq=seq)
+            else:
+                # A frame that can't be decoded or doesn't match the frame format; the client needs to know why
+                response = dropped_response(seq=seq, error=str(e.detail))
+        except Exception as e:
+            # A frame that can't be decoded or processed still gets its answer
+            print(f"Gesture stream {session_id}: frame {seq} failed: {e!r}")
+            response = dropped_response(seq=seq, error=type(e).__name__)
+        try:
+            async with send_lock:
+                await websocket.send_json(response.model_dump())
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+
+    # Frames being answered; kept referenced so the loop can't collect them mid-flight
+    tasks: set[asyncio.Task] = set()
+    try:
+        # One binary message per camera frame, answered with one InputResponse on the same socket.
+        # Frames are not awaited one by one, so a newer frame can replace one still waiting for inference.
+        # Frames are numbered in the order they arrive, which is the order the client sent them in; answers
+        # can go out in a different order and carry the number back.
+        seq = 0
+        while True:
+            frame = await websocket.receive_bytes()
+            seq += 1
+            task = asyncio.create_task(answer(frame, seq))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except WebSocketDisconnect:
+        print(f"Gesture stream {session_id} disconnected")
+    finally:
+        for task in tasks:
+            task.cancel()
 
 @app.post("/create_constellation")
 async def create_constellation(request: CreateConstellationRequest) -> CreateConstellationResponse:
@@ -93,22 +223,40 @@ async def create_constellation(request: CreateConstellationRequest) -> CreateCon
 
 
 @app.post("/list_all_constellations")
-async def list_all_constellations(request: Request) -> ConstellationsResponse:
-    constellations = await getAllConstellationsByUser()
-    return ConstellationsResponse(constellations=constellations)
+async def list_all_constellations(
+    request: Request,
+    encoding: Literal["nested", "compact"] = "nested",
+    ra: float | None = None,
+    dec: float | None = None,
+    dist: float | None = None,
+    authorization: str | None = Header(None),
+) -> ConstellationsResponse | CompactConstellationsResponse:
+    # With the observer's ra/dec/dist, every star comes with its x/y/z relative to it
+    observer = (ra, dec, dist) if ra is not None and dec is not None and dist is not None else None
+    access_token = authorization.removeprefix("Bearer ").strip() if authorization else None
+    constellations, version = await getAllConstellationsByUser(
+        access_token, compact=encoding == "compact", observer=observer
+    )
+    if encoding == "compact":
+        # Already plain JSON types, sent as is without building response models
+        return JSONResponse(content={**constellations, "version": version})
+    return ConstellationsResponse(constellations=constellations, version=version)
 
 
 @app.post("/list_active_constellations")
 async def list_active_constellations(
     request: ActiveConstellationsRequest,
-) -> ConstellationsResponse:
-    constellations = await getActiveConstellationsByUser(
-        request.ra, request.dec, request.dist, request.jwt
+) -> ConstellationsResponse | CompactConstellationsResponse:
+    constellations, version = await getActiveConstellationsByUser(
+        request.user_id, request.ra, request.dec, request.dist, request.radius,
+        compact=request.encoding == "compact", with_positions=request.positions,
     )
-    return ConstellationsResponse(constellations=constellations)
+    if request.encoding == "compact":
+        return JSONResponse(content={**constellations, "version": version})
+    return ConstellationsResponse(constellations=constellations, version=version)
 
 @app.get("/login")
-def login(request: Request):
+async def login(request: Request):
 
     lang = request.query_params.get("lang")
 
@@ -118,7 +266,7 @@ def login(request: Request):
 
     try:
         redirect_url = "http://localhost:8000/callback"
-        response = supabase.auth.sign_in_with_oauth({
+        response = await get_auth_client().auth.sign_in_with_oauth({
             "provider": "google",
             "options": {
                 "redirect_to": redirect_url
@@ -140,17 +288,17 @@ async def logout ():
         print("WebSocket connection closed.")
 
     try:
-        supabase.auth.sign_out()
+        await get_auth_client().auth.sign_out()
     except:
         raise HTTPException(status_code=500, detail="Error during logout")
     
     return {"message": "Logout successful", "status": 200}
 
 @app.get("/callback")
-def callback(request: Request):
+async def callback(request: Request):
     try:
         code = request.query_params.get("code")
-        response = supabase.auth.exchange_code_for_session({
+        response = await get_auth_client().auth.exchange_code_for_session({
             "auth_code": code,
         })
 
@@ -0,0 +1,116 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+import pyvo as vo
+from .utils import format_exoplanet_row, gaia_source_id
+
+
+client = vo.dal.TAPService("https://exoplanetarchive.ipac.caltech.edu/TAP")
+
+SYNC_INTERVAL = int(os.getenv("CATALOG_SYNC_INTERVAL", "21600"))
+
+# Current snapshot of pscomppars. Readers grab the reference once and never see a half-applied sync,
+# because sync_catalog builds a new dict and replaces the global in a single assignment.
+catalog = {
+    "version": 0,
+    "synced_at": None,
+    "planets": {},
+    "by_gaia_id": {},
+}
+
+sync_task: asyncio.Task | None = None
+
+
+def build_delta_query(since: str | None) -> str:
+    where = ""
+    if since:
+        # Only rows touched or released since the last sync; the archive keeps both dates per row
+        where = f"""WHERE
+        rowupdate >= to_date('{since}', 'yyyy-mm-dd') OR
+        releasedate >= to_date('{since}', 'yyyy-mm-dd')"""
+
+    return f"""
+    SELECT
+        pl_name AS "name",
+        hostname AS "host_star",
+        sy_snum AS "stars_amount",
+        disc_year AS "discovery_year",
+        pl_rade AS "radius",
+        ra AS "ra",
+        dec AS "dec",
+        sy_dist AS "dist",
+        gaia_id AS "id"
+    FROM
+        pscomppars
+    {where}
+    """
+
+
+def sync_catalog() -> bool:
+    """
+    Pulls the pscomppars rows changed since the last sync and swaps in a new catalog snapshot
+
+    The first call downloads the whole table, later calls only the delta. Rows are merged by planet name,
+    and only the index entries of the changed rows are touched; the previous snapshot is left intact
+    for the readers still holding it.
+
+    Returns:
+        A bool indicating if the catalog changed
+    """
+    global catalog
+    current = catalog
+    started = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    result = client.search(build_delta_query(current["synced_at"]))
+
+    if len(result) == 0:
+        catalog = {**current, "synced_at": started}
+        return False
+
+    planets = dict(current["planets"])
+    by_gaia_id = dict(current["by_gaia_id"])
+    changed = False
+
+    for row in result:
+        p = format_exoplanet_row(row)
+        name = p["name"]
+        old = planets.get(name)
+        if old == p:
+            continue
+        changed = True
+
+        if old and old["id"]:
+            old_key = gaia_source_id(old["id"])
+            by_gaia_id[old_key] = [n for n in by_gaia_id.get(old_key, []) if n != name]
+            if not by_gaia_id[old_key]:
+                del by_gaia_id[old_key]
+        if p["id"]:
+            new_key = gaia_source_id(p["id"])
+            by_gaia_id[new_key] = by_gaia_id.get(new_key, []) + [name]
+
+        planets[name] = p
+
+    catalog = {
+        "version": current["version"] + 1 if changed else current["version"],
+        "synced_at": started,
+        "planets": planets if changed else current["planets"],
+        "by_gaia_id": by_gaia_id if changed else current["by_gaia_id"],
+    }
+    return changed
+
+
+async def run_catalog_sync() -> None:
+    while True:
+        try:
+            # The TAP client is blocking, keep it off the event loop
+            changed = await asyncio.to_thread(sync_catalog)
+            print(f"Catalog sync done, version {catalog['version']}, changed: {changed}")
+        except Exception as e:
+            print(f"Catalog sync failed: {str(e)}")
+        await asyncio.sleep(SYNC_INTERVAL)
+
+
+def start_catalog_sync() -> None:
+    global sync_task
+    if sync_task is None:
+        sync_task = asyncio.create_task(run_catalog_sync())
@@ -0,0 +1,84 @@
+import hashlib
+import struct
+import numpy as np
+from fastapi import HTTPException
+from . import catalog
+from ..stars.services import celestial_to_cartesian
+
+
+MAGIC = b"EXMP"
+FORMAT_VERSION = 1
+
+# Little endian header: magic, format version, content version (the first 4 bytes of the content hash),
+# point count, name table size in bytes
+HEADER = struct.Struct("<4sIIII")
+POINT_DTYPE = np.dtype([("x", "<f4"), ("y", "<f4"), ("z", "<f4"), ("name", "<u4")])
+
+galaxy_map = {
+    # The catalog version the map was built from; only tells this process when to rebuild
+    "catalog_version": -1,
+    # Hash of the points and names: the same map gets the same version in every process and across restarts
+    "version": "",
+    "blob": b"",
+    "etag": "",
+}
+
+
+def build_galaxy_map(snapshot: dict) -> tuple[bytes, str]:
+    """
+    Packs every host system of the catalog into a binary blob
+
+    Layout: the header, then one (x, y, z, name index) record per host, then the host names as UTF-8
+    separated by newlines. Coordinates are in parsecs, heliocentric, from the first planet of each host
+    that has ra, dec and sy_dist.
+
+    Parameters:
+        snapshot: A catalog snapshot as kept by catalog.catalog
+
+    Returns:
+        The blob bytes and the hex hash of its content, which versions it
+    """
+    hosts: dict[str, tuple[float, float, float]] = {}
+    for p in snapshot["planets"].values():
+        host = p["host_star"]
+        if not host or host in hosts:
+            continue
+        try:
+            hosts[host] = (float(p["ra"]), float(p["dec"]), float(p["dist"]))
+        except ValueError:
+            # Missing values come as "" (or "--" when masked)
+            continue
+
+    names = sorted(hosts)
+    coords = np.array([hosts[name] for name in names], dtype=np.float64).reshape(-1, 3)
+    x, y, z = celestial_to_cartesian(coords[:, 0], coords[:, 1], coords[:, 2])
+
+    points = np.empty(len(names), dtype=POINT_DTYPE)
+    points["x"] = x
+    points["y"] = y
+    points["z"] = z
+    points["name"] = np.arange(len(names), dtype=np.uint32)
+
+    name_table = "\n".join(names).encode("utf-8")
+    body = points.tobytes() + name_table
+    content_hash = hashlib.sha256(body).hexdigest()[:16]
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, int(content_hash[:8], 16), len(names), len(name_table))
+    return header + body, content_hash
+
+
+def get_galaxy_map() -> dict:
+    global galaxy_map
+    snapshot = catalog.catalog
+    if snapshot["version"] == 0:
+        raise HTTPException(status_code=503, detail="Exoplanet catalog not loaded yet")
+
+    # Rebuilt only when the catalog sync produced a new version
+    if galaxy_map["catalog_version"] != snapshot["version"]:
+        blob, content_hash = build_galaxy_map(snapshot)
+        galaxy_map = {
+            "catalog_version": snapshot["version"],
+            "version": content_hash,
+            "blob": blob,
+            "etag": f'"galaxy-map-{FORMAT_VERSION}-{content_hash}"',
+        }
+    return galaxy_map
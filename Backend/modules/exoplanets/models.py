@@ -11,6 +11,10 @@ class Exoplanet(BaseModel):
 class ExoplanetsByNameRequest(BaseModel):
     name: str
 
+class ExoplanetsBulkRequest(BaseModel):
+    keys: list[str]
+    by: str = "gaia_id"
+
 class RequestExoplanets(BaseModel):
     index: int | None
     amount: int | None
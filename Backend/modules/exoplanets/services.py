@@ -1,6 +1,9 @@
+import asyncio
 import astropy.table
 from fastapi import HTTPException
 from .models import Exoplanet, RequestExoplanets
+from .utils import format_exoplanet_row, gaia_source_id
+from . import catalog
 from pydantic import BaseModel
 from astropy.table import Table
 import pyvo as vo
@@ -14,6 +17,11 @@ from typing import Any
 
 client = vo.dal.TAPService("https://exoplanetarchive.ipac.caltech.edu/TAP")
 
+BULK_CHUNK_SIZE = 200
+
+# Gaia source id -> names of the planets it hosts, filled on first use
+host_index: dict[str, list[str]] = {}
+
 
 def result_to_exoplanet_list(result: astropy.table) -> list[Exoplanet]:
     exoplanets = []
@@ -105,16 +113,107 @@ async def find_exoplanets_by_name(name: str) -> str:
     result = client.search(query)
     #print(result)
     if len(result) == 0: return "";
-    planets = []
-    for row in result:
-        p = {}
-        for key in row:
-            val = str( row[key] )
-            p[key] = val if val != 'nan' else ""
-        planets.append(p)
+    planets = [format_exoplanet_row(row) for row in result]
     return json.dumps(planets)
 
 
+def build_in_list(values: list[str]) -> str:
+    return ", ".join("'" + value.replace("'", "''") + "'" for value in values)
+
+
+async def find_exoplanets_bulk(keys: list[str], by: str) -> str:
+    global client
+    if by not in ("gaia_id", "name"):
+        raise HTTPException(status_code=400, detail="Lookup key must be 'gaia_id' or 'name'")
+    column = "gaia_id" if by == "gaia_id" else "pl_name"
+
+    unique_keys = list(dict.fromkeys(key.strip() for key in keys if key.strip()))
+    matches: dict[str, list[dict[str, str]]] = {key: [] for key in unique_keys}
+
+    snapshot = catalog.catalog
+    if snapshot["version"] > 0:
+        for key in unique_keys:
+            if by == "gaia_id":
+                names = snapshot["by_gaia_id"].get(gaia_source_id(key), [])
+            else:
+                names = [key] if key in snapshot["planets"] else []
+            matches[key] = [snapshot["planets"][name] for name in sorted(names)]
+    else:
+        # Gaia ids are matched by source id, whichever release the caller's designation names
+        lookup = {key: gaia_source_id(key) if by == "gaia_id" else key for key in unique_keys}
+        values = list(dict.fromkeys(lookup.values()))
+        if by == "gaia_id":
+            values = [f"Gaia {release} {source_id}" for source_id in values for release in ("DR2", "DR3")]
+        found: dict[str, list[dict[str, str]]] = {}
+        # One query per chunk instead of one per key; the chunk keeps the ADQL under the archive's size limit
+        for start in range(0, len(values), BULK_CHUNK_SIZE):
+            chunk = values[start:start + BULK_CHUNK_SIZE]
+            query = f"""
+        SELECT
+            pl_name AS "name",
+            hostname AS "host_star",
+            sy_snum AS "stars_amount",
+            disc_year AS "discovery_year",
+            pl_rade AS "radius",
+            ra AS "ra",
+            dec AS "dec",
+            sy_dist AS "dist",
+            gaia_id AS "id"
+        FROM
+            pscomppars
+        WHERE
+            {column} IN ({build_in_list(chunk)})
+        ORDER BY pl_name ASC
+        """
+            result = client.search(query)
+            for row in result:
+                p = format_exoplanet_row(row)
+                found.setdefault(gaia_source_id(p["id"]) if by == "gaia_id" else p["name"], []).append(p)
+        for key in unique_keys:
+            matches[key] = sorted(found.get(lookup[key], []), key=lambda p: p["name"])
+
+    # Keep the caller's order, duplicates included
+    return json.dumps([
+        {"key": key, "exoplanets": matches.get(key.strip(), [])} for key in keys
+    ])
+
+
+async def load_host_index() -> dict[str, list[str]]:
+    """
+    Maps Gaia source ids to the names of the planets they host
+
+    The catalog snapshot's index is used once it is loaded; before that the archive is scanned once, off
+    the event loop, and the result kept. pscomppars gives DR2 designations and the surroundings DR3 ones,
+    so the two are matched by source id only: most sources kept their id from DR2 to DR3, but Gaia does
+    not guarantee it, and a host whose id changed is not annotated.
+
+    Returns:
+        A dict from source id to planet names
+    """
+    global client, host_index
+    snapshot = catalog.catalog
+    if snapshot["version"] > 0:
+        return snapshot["by_gaia_id"]
+    if host_index:
+        return host_index
+
+    query = """
+    SELECT
+        gaia_id,
+        pl_name
+    FROM
+        pscomppars
+    WHERE
+        gaia_id IS NOT NULL
+    """
+    result = await asyncio.to_thread(client.search, query)
+    index: dict[str, list[str]] = {}
+    for row in result:
+        index.setdefault(gaia_source_id(str(row["gaia_id"])), []).append(str(row["pl_name"]))
+    host_index = index
+    return host_index
+
+
 '''
     ra, dec = exoplanets[0].ra, exoplanets[0].dec
     coord = SkyCoord(ra=ra * u.deg, dec=dec * u.deg, frame="icrs")
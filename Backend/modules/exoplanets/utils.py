@@ -13,4 +13,17 @@ def parse_dec_to_degrees(dec_string):
     seconds = float(parts[2])
     
     sign = -1 if degrees < 0 else 1
-    return sign * (abs(degrees) + (minutes / 60) + (seconds / 3600))
\ No newline at end of file
+    return sign * (abs(degrees) + (minutes / 60) + (seconds / 3600))
+
+
+def gaia_source_id(designation: str) -> str:
+    # pscomppars stores "Gaia DR2 <id>" while surroundings come as "Gaia DR3 <id>"; compare only the number
+    return designation.strip().split(" ")[-1]
+
+
+def format_exoplanet_row(row) -> dict[str, str]:
+    p = {}
+    for key in row:
+        val = str(row[key])
+        p[key] = val if val != 'nan' else ""
+    return p
@@ -0,0 +1,157 @@
+import asyncio
+import os
+from collections import deque
+from .processor import hand_features
+from .pipeline import detect_frame, track_frame, run_frame
+from .workers import run_in_worker
+from .models import FrameFormat
+
+
+# Frames arriving within this many milliseconds of the first one of a batch go to the worker pool
+# together, 0 disables batching
+BATCH_WINDOW_MS = float(os.getenv("GESTURE_BATCH_WINDOW_MS", "5"))
+# A batch is flushed right away once it holds this many frames
+BATCH_MAX = int(os.getenv("GESTURE_BATCH_MAX", "32"))
+# A frame whose detection is done waits at most this long for others of its batch to share the feature
+# pass; a frame still running then is not waited for, it gets a pass of its own
+BATCH_SHARE_MS = float(os.getenv("GESTURE_BATCH_SHARE_MS", "2"))
+METRICS_WINDOW = 256
+
+# Frames waiting for the current batch: (session_id, file_bytes, frame_format, now, future)
+batch = {
+    "items": [],
+    "timer": None,
+}
+
+# The loop only keeps weak references to tasks, running batches and trackings are held here
+batch_tasks: set[asyncio.Task] = set()
+
+metrics = {
+    "batches": 0,
+    "batch_sizes": deque(maxlen=METRICS_WINDOW),
+    "feature_passes": 0,
+}
+
+
+def keep_task(coroutine) -> asyncio.Task:
+    task = asyncio.create_task(coroutine)
+    batch_tasks.add(task)
+    task.add_done_callback(batch_tasks.discard)
+    return task
+
+
+async def run_batched(session_id: str, file_bytes: bytes, frame_format: FrameFormat, now: float) -> dict:
+    """
+    Runs a frame together with the frames other sessions sent at about the same time
+
+    Mediapipe has no batched detection in Python, so the frames of a batch are handed to the worker
+    pool at once and detected in parallel, each on its session's worker. The detections that finish
+    within BATCH_SHARE_MS of each other get their gesture features in one vectorized pass. Every frame
+    is then tracked and answered on its own: a slow frame never holds back the others of its batch,
+    and no frame waits more than BATCH_WINDOW_MS + BATCH_SHARE_MS for them.
+
+    Parameters:
+        session_id: The session the frame belongs to
+        file_bytes: The frame as uploaded
+        frame_format: How the frame is encoded
+        now: The frame's timestamp in milliseconds
+
+    Returns:
+        The object to be sent for the frame, like pipeline.run_frame
+
+    Example:
+        >>> send = await run_batched("classroom-3", file_bytes, FrameFormat(), 1520.0)
+    """
+    if BATCH_WINDOW_MS <= 0:
+        return await run_in_worker(session_id, run_frame, file_bytes, session_id, frame_format, now)
+
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    batch["items"].append((session_id, file_bytes, frame_format, now, future))
+
+    if len(batch["items"]) >= BATCH_MAX:
+        flush_batch()
+    elif batch["timer"] is None:
+        # The window runs from the batch's first frame, later frames don't extend it
+        batch["timer"] = loop.call_later(BATCH_WINDOW_MS / 1000, flush_batch)
+
+    return await future
+
+
+def flush_batch() -> None:
+    if batch["timer"] is not None:
+        batch["timer"].cancel()
+        batch["timer"] = None
+    items = batch["items"]
+    batch["items"] = []
+    if items:
+        metrics["batches"] += 1
+        metrics["batch_sizes"].append(len(items))
+        keep_task(run_batch(items))
+
+
+async def run_batch(items: list) -> None:
+    # Every frame is pinned to its session's worker, so the detections of a batch run in parallel
+    detections = {}
+    for item in items:
+        session_id, file_bytes, frame_format, now, future = item
+        detections[keep_task(run_in_worker(session_id, detect_frame, file_bytes, session_id, frame_format))] = item
+    pending = set(detections)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if pending and BATCH_SHARE_MS > 0:
+                # The ones finishing right behind share the feature pass, the rest are not waited for
+                more, pending = await asyncio.wait(pending, timeout=BATCH_SHARE_MS / 1000)
+                done |= more
+            finish_group([(detections[task], task) for task in done])
+    except Exception as e:
+        # No frame is left waiting on a batch that broke
+        for session_id, file_bytes, frame_format, now, future in items:
+            if not future.done():
+                future.set_exception(e)
+
+
+def finish_group(group: list) -> None:
+    found = []
+    for (session_id, file_bytes, frame_format, now, future), task in group:
+        if task.exception() is not None:
+            if not future.done():
+                future.set_exception(task.exception())
+        elif task.result() is not None:
+            found.append(task.result())
+
+    left_hands = [detected["left"] for detected in found if detected["left"]]
+    right_hands = [detected["right"] for detected in found if detected["right"]]
+    if left_hands or right_hands:
+        try:
+            hand_features(left_hands, right_hands)
+            metrics["feature_passes"] += 1
+        except Exception:
+            # The hands without features get them one by one in track_hands
+            pass
+
+    for (session_id, file_bytes, frame_format, now, future), task in group:
+        if task.exception() is None:
+            keep_task(track(session_id, task.result(), now, future))
+
+
+async def track(session_id: str, detected: dict | None, now: float, future: asyncio.Future) -> None:
+    # On the session's worker, where its lock may be waited for without blocking the event loop
+    try:
+        send = await run_in_worker(session_id, track_frame, session_id, detected, now)
+    except Exception as e:
+        if not future.done():
+            future.set_exception(e)
+        return
+    if not future.done():
+        future.set_result(send)
+
+
+def get_batch_metrics() -> dict:
+    sizes = list(metrics["batch_sizes"])
+    return {
+        "batches": metrics["batches"],
+        "mean_batch_size": sum(sizes) / len(sizes) if sizes else 0.0,
+        "feature_passes": metrics["feature_passes"],
+    }
@@ -0,0 +1,69 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+import cv2
+
+
+# Off unless asked for: the production path must not copy, encode or write frames
+CAPTURE_ENABLED = os.getenv("GESTURE_DEBUG_CAPTURE", "0") == "1"
+CAPTURE_SIZE = int(os.getenv("GESTURE_DEBUG_CAPTURE_SIZE", "60"))
+CAPTURE_EVERY = int(os.getenv("GESTURE_DEBUG_CAPTURE_EVERY", "10"))
+DUMP_DIR = os.getenv("GESTURE_DEBUG_DUMP_DIR", "debug_frames")
+
+captures: deque = deque(maxlen=CAPTURE_SIZE)
+capture_state = {"seen": 0}
+capture_lock = threading.Lock()
+
+
+def landmarks_to_lists(found: list[dict]) -> list[dict]:
+    return [{"handedness": hand["handedness"], "landmark": hand["landmark"].tolist()} for hand in found]
+
+
+def capture_frame(frame, found: list[dict]) -> None:
+    """
+    Keeps one in every CAPTURE_EVERY frames, with its landmarks, in the in-memory ring buffer
+
+    Parameters:
+        frame: The whole RGB frame, as mirrored for inference. It is stored as is, not copied, since the
+               pipeline creates a new array per frame
+        found: The hand dicts found in it, landmarks normalized to the whole frame
+    """
+    if not CAPTURE_ENABLED:
+        return
+
+    with capture_lock:
+        capture_state["seen"] += 1
+        if capture_state["seen"] % CAPTURE_EVERY != 0:
+            return
+        captures.append({
+            "time": time.time(),
+            "frame": frame,
+            "hands": landmarks_to_lists(found),
+        })
+
+
+def dump_captures() -> tuple[str, int]:
+    """
+    Writes the buffered frames as JPEGs plus a landmarks.json into a new folder under DUMP_DIR
+
+    Returns:
+        The folder written and the number of frames in it
+    """
+    with capture_lock:
+        snapshot = list(captures)
+
+    folder = os.path.join(DUMP_DIR, time.strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(folder, exist_ok=True)
+
+    index = []
+    for i, capture in enumerate(snapshot):
+        file_name = f"frame_{i:04d}.jpg"
+        cv2.imwrite(os.path.join(folder, file_name), cv2.cvtColor(capture["frame"], cv2.COLOR_RGB2BGR))
+        index.append({"file": file_name, "time": capture["time"], "hands": capture["hands"]})
+
+    with open(os.path.join(folder, "landmarks.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+
+    return folder, len(snapshot)
@@ -0,0 +1,64 @@
+import numpy as np
+import cv2
+from fastapi import HTTPException
+from .models import FrameFormat
+
+
+# Raw formats and the conversion that takes them to RGB, None when the buffer is used as is
+RAW_FORMATS = {
+    "rgb": None,
+    "bgr": cv2.COLOR_BGR2RGB,
+    "nv12": cv2.COLOR_YUV2RGB_NV12,
+    "nv21": cv2.COLOR_YUV2RGB_NV21,
+    "i420": cv2.COLOR_YUV2RGB_I420,
+}
+
+
+def validate_frame_format(frame_format: FrameFormat) -> None:
+    if frame_format.format == "encoded":
+        return
+    if frame_format.format not in RAW_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown frame format '{frame_format.format}'")
+    if frame_format.width <= 0 or frame_format.height <= 0:
+        raise HTTPException(status_code=400, detail="Raw frames need width and height")
+
+
+def decode_frame(data: bytes, frame_format: FrameFormat):
+    """
+    Turns the bytes sent by the client into the RGB frame mediapipe expects
+
+    Encoded images (jpeg, png...) are decoded with OpenCV. Raw buffers are wrapped with np.frombuffer,
+    without copying, and go through at most one colour conversion; rgb needs none at all. Clients can
+    downscale before sending, any size works.
+
+    Parameters:
+        data: The frame bytes
+        frame_format: How the bytes are laid out
+
+    Returns:
+        An RGB uint8 array of shape (height, width, 3)
+
+    Example:
+        >>> decode_frame(buffer, FrameFormat(format="nv21", width=320, height=240)).shape
+        (240, 320, 3)
+    """
+    if frame_format.format == "encoded":
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise HTTPException(status_code=400, detail="Could not decode frame")
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+    width, height = frame_format.width, frame_format.height
+    conversion = RAW_FORMATS[frame_format.format]
+    # YUV 4:2:0 stores a full luma plane plus chroma at half resolution, packed under it
+    rows = height if frame_format.format in ("rgb", "bgr") else height * 3 // 2
+    channels = 3 if frame_format.format in ("rgb", "bgr") else 1
+
+    if len(data) != rows * width * channels:
+        raise HTTPException(status_code=400, detail="Frame size does not match width and height")
+
+    buffer = np.frombuffer(data, np.uint8)
+    buffer = buffer.reshape((rows, width, 3) if channels == 3 else (rows, width))
+    if conversion is None:
+        return buffer
+    return cv2.cvtColor(buffer, conversion)
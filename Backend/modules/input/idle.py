@@ -0,0 +1,52 @@
+import os
+import cv2
+
+
+# After this many frames in a row without hands the session goes idle
+IDLE_AFTER_FRAMES = int(os.getenv("GESTURE_IDLE_AFTER_FRAMES", "30"))
+# While idle only one in this many frames is looked at, the others are answered without decoding
+IDLE_PROBE_EVERY = int(os.getenv("GESTURE_IDLE_PROBE_EVERY", "5"))
+# Idle probes run on the frame downscaled to this longest side
+IDLE_PROBE_MAX_SIDE = int(os.getenv("GESTURE_IDLE_PROBE_MAX_SIDE", "256"))
+
+
+def new_idle_state() -> dict:
+    return {
+        "empty_frames": 0,
+        "skipped": 0,
+    }
+
+
+def is_idle(idle: dict | None) -> bool:
+    return idle is not None and idle["empty_frames"] >= IDLE_AFTER_FRAMES
+
+
+def should_skip_frame(idle: dict | None) -> bool:
+    if not is_idle(idle):
+        return False
+    idle["skipped"] += 1
+    return idle["skipped"] % IDLE_PROBE_EVERY != 0
+
+
+def probe_frame(frame):
+    scale = IDLE_PROBE_MAX_SIDE / max(frame.shape[:2])
+    if scale >= 1:
+        return frame
+    return cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def update_idle(idle: dict | None, hands_found: bool) -> None:
+    """
+    Counts the frames without hands; a single hand brings the session back to full rate
+
+    Parameters:
+        idle: The session's idle state
+        hands_found: Whether this frame had any hand
+    """
+    if idle is None:
+        return
+    if hands_found:
+        idle["empty_frames"] = 0
+        idle["skipped"] = 0
+    else:
+        idle["empty_frames"] += 1
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, conlist
 
 
 class Cursor(BaseModel):
@@ -11,8 +11,65 @@ class Rotation(BaseModel):
     dy: float = 0
 
 
+class FrameFormat(BaseModel):
+    # "encoded" (jpeg, png...) or a raw layout: "rgb", "bgr", "nv12", "nv21", "i420"
+    format: str = "encoded"
+    width: int = 0
+    height: int = 0
+    # The client already mirrored the frame, skip the flip
+    mirrored: bool = False
+
+
+class HandLandmarks(BaseModel):
+    # "Left" or "Right" as seen by the user, the same labels get_gesture uses after mirroring
+    handedness: str
+    # 21 normalized [x, y, z] points in mediapipe's order
+    landmark: conlist(conlist(float, min_length=3, max_length=3), min_length=21, max_length=21)
+
+
+class LandmarksRequest(BaseModel):
+    session_id: str = "default"
+    hands: list[HandLandmarks]
+    # Capture time in milliseconds, on the client's clock
+    timestamp: float | None = None
+
+
 class InputResponse(BaseModel):
     cursor: Cursor
     right_gesture: str
     rotation: Rotation
     zoom: float
+    dropped: bool = False
+    processing_rate: float = 0
+    # No hands for a while: the client can lower its capture rate until this goes back to False
+    idle: bool = False
+    # The frame's sequence number, so answers arriving out of order can be matched to their frames
+    seq: int | None = None
+    # Set when the frame could not be processed; the frame is also reported as dropped
+    error: str | None = None
+
+
+class LatencyPercentiles(BaseModel):
+    p50: float
+    p95: float
+    p99: float
+
+
+class InputMetricsResponse(BaseModel):
+    workers: int
+    frames: int
+    rejected: int
+    dropped: int
+    errors: int
+    queue_depth: list[int]
+    queue_wait_ms: LatencyPercentiles
+    processing_ms: LatencyPercentiles
+    batches: int = 0
+    mean_batch_size: float = 0.0
+    # Vectorized feature passes; fewer than frames when detections of a batch finished together
+    feature_passes: int = 0
+
+
+class DebugDumpResponse(BaseModel):
+    folder: str
+    frames: int
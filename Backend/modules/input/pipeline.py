@@ -0,0 +1,52 @@
+from .processor import find_hands, track_hands
+from .frames import decode_frame
+from .sessions import locked_session, thread_scanner
+from .roi import ROI_ENABLED
+from .idle import is_idle, should_skip_frame
+from .models import FrameFormat
+
+
+def detect_frame(file_bytes: bytes, session_id: str, frame_format: FrameFormat) -> dict | None:
+    """
+    Decodes a frame and finds its hands, the blocking half of a frame's work
+
+    Parameters:
+        file_bytes: The frame as uploaded
+        session_id: The session the frame belongs to
+        frame_format: How the frame is encoded, see frames.decode_frame
+
+    Returns:
+        {'left', 'right', 'idle'} with the hand dicts, or None when the session is idle and the frame
+        was skipped without decoding
+    """
+    # Checked before leasing: a skipped frame must not take a Hands instance from the pool
+    with locked_session(session_id, needs_hands=False) as session:
+        if should_skip_frame(session["idle"]):
+            # Idle sessions only get every few frames looked at, the rest are not even decoded
+            return None
+
+    with locked_session(session_id) as session:
+        img = decode_frame(file_bytes, frame_format)
+        left_hand, right_hand = find_hands(
+            img,
+            session["hands"],
+            frame_format.mirrored,
+            session["roi"],
+            session["idle"],
+            thread_scanner() if ROI_ENABLED else None,
+        )
+        return {"left": left_hand, "right": right_hand, "idle": is_idle(session["idle"])}
+
+
+def track_frame(session_id: str, detected: dict | None, now: float) -> dict:
+    # Only the state machines, no inference: the session's Hands is not needed
+    if detected is None:
+        return {"idle": True}
+    with locked_session(session_id, needs_hands=False) as session:
+        send = track_hands(session["left_tracker"], session["right_tracker"], detected["left"], detected["right"], now)
+    send["idle"] = detected["idle"]
+    return send
+
+
+def run_frame(file_bytes: bytes, session_id: str, frame_format: FrameFormat, now: float) -> dict:
+    return track_frame(session_id, detect_frame(file_bytes, session_id, frame_format), now)
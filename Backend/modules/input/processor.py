@@ -1,60 +1,72 @@
 import math
-import statistics
+import numpy as np
 import cv2
+from .debug import capture_frame
+from .roi import should_use_roi, should_scan, enter_geometry, crop_to_roi, to_frame_coordinates, update_roi, FULL_FRAME
+from .idle import is_idle, probe_frame, update_idle
 
 
-def is_click(hand_landmarks, side: str) -> bool:
+# Columns of a landmark array
+X, Y, Z = 0, 1, 2
+
+# Metacarpophalangeal joints of index, middle, ring and pinky
+MCP = [5, 9, 13, 17]
+
+
+def finite_or(values, neutral):
+    # Degenerate hands (landmarks on top of each other) divide by zero; they get the neutral value instead
+    # of a NaN or inf that would break the JSON response
+    return np.where(np.isfinite(values), values, neutral)
+
+
+def landmarks_to_array(hand_landmarks) -> np.ndarray:
+    """
+    Converts mediapipe's landmark list into a (21, 3) array, once per hand and frame
+
+    Parameters:
+        hand_landmarks: A NormalizedLandmarkList as returned by Hands.process
+
+    Returns:
+        A float64 array with the [x, y, z] of every landmark
+    """
+    return np.array([[point.x, point.y, point.z] for point in hand_landmarks.landmark], dtype=np.float64)
+
+
+def is_click(hand_landmarks, side: str):
     """
     Decides if the current hand's position looks like a 'L'
 
     Checks if the index finger is straight, the thumb is to the side and the rest of finger supported on the palm
 
     Parameters:
-        hand_landmarks: A list containing the current position of the fingers' landmarks.
+        hand_landmarks: A (21, 3) landmark array, or a (N, 21, 3) stack of them
         side: A string with the values of 'left' or 'right'
 
     Returns:
-        A bool indicating if the hand is in that position
+        A bool (or a (N,) bool array) indicating if the hand is in that position
 
     Example:
         >>> is_click(landmark, 'left')
         True
     """
-    flag = False
-    middle_hand_y = statistics.mean([
-        hand_landmarks[5].y,
-        hand_landmarks[9].y,
-        hand_landmarks[13].y,
-        hand_landmarks[17].y
-    ])
-    mean_finger_y = statistics.mean([
-        hand_landmarks[12].y,
-        hand_landmarks[16].y,
-        hand_landmarks[20].y,
-    ])
-    index_finger_points = [
-        hand_landmarks[8].x,
-        hand_landmarks[7].x,
-        hand_landmarks[6].x,
-    ]
-    range_index_finger_x = max(index_finger_points) - max(index_finger_points)
-    alignment = hand_landmarks[8].y < hand_landmarks[7].y < hand_landmarks[6].y
-
-
-    flag = alignment and \
-        ( -0.07 < range_index_finger_x < 0.07 ) and \
-        middle_hand_y < mean_finger_y and \
-        hand_landmarks[10].y > hand_landmarks[6].y
+    x = hand_landmarks[..., X]
+    y = hand_landmarks[..., Y]
+    middle_hand_y = y[..., MCP].mean(axis=-1)
+    mean_finger_y = y[..., [12, 16, 20]].mean(axis=-1)
+    alignment = (y[..., 8] < y[..., 7]) & (y[..., 7] < y[..., 6])
+
+    flag = alignment & \
+        (middle_hand_y < mean_finger_y) & \
+        (y[..., 10] > y[..., 6])
     if (side == 'left'):
-        flag = flag and hand_landmarks[4].x > hand_landmarks[3].x
+        flag = flag & (x[..., 4] > x[..., 3])
     elif (side == 'right'):
-        flag = flag and hand_landmarks[4].x < hand_landmarks[3].x
-        
+        flag = flag & (x[..., 4] < x[..., 3])
 
     return flag
 
 
-def get_rotation(landmark, reference: list) -> tuple[int, int]:
+def get_rotation(landmark, reference: list):
     """
     Calculates the angular velocity of the index finger relative to a reference point.
 
@@ -66,108 +78,86 @@ def get_rotation(landmark, reference: list) -> tuple[int, int]:
     and a quadratic function to account for changes in the finger's position over time.
 
     Parameters:
-        landmark: A list containing the current position of the fingers' landmarks.
+        landmark: A (21, 3) landmark array, or a (N, 21, 3) stack of them
         reference (list): A list containing the reference distance and the position of the index finger at the moment of mode switching.
                           The reference distance is calculated from the MCP joints of the index finger and pinky.
 
     Returns:
-        Tuple[int, int]: A tuple containing the estimated angular velocity in two components (x, y).
+        A tuple containing the estimated angular velocity in two components (x, y), floored; arrays for a stack.
 
     Example:
         >>> get_rotation(current_landmark, reference_data)
-        (10, 15)
+        (10.0, 15.0)
     """
-    reference_distance = reference[2]
-    reference_x = reference[0]
-    reference_y = reference[1]
-    cursor_x = landmark[8].x
-    cursor_y = landmark[8].y
-    dx = (cursor_x - reference_x) / reference_distance
-    dy = (cursor_y - reference_y) / reference_distance
+    reference_x, reference_y, reference_distance = reference
+    cursor_x = landmark[..., 8, X]
+    cursor_y = landmark[..., 8, Y]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dx = finite_or((cursor_x - reference_x) / reference_distance, 0.0)
+        dy = finite_or((cursor_y - reference_y) / reference_distance, 0.0)
 
     # Angular velocity
     dx = dx**2 * 125 / 4
     dy = dy**2 * 125 / 4
-    if cursor_x < reference_x:
-        dx *= -1
-    if cursor_y > reference_y:
-        dy *= -1
-    return math.floor(dx), math.floor(dy)
+    dx = np.where(cursor_x < reference_x, -dx, dx)
+    dy = np.where(cursor_y > reference_y, -dy, dy)
+    return np.floor(dx), np.floor(dy)
 
 
-def get_zoom(landmark) -> float:
+def get_zoom(landmark):
     """
     Calculates the percentage of zoom
 
     It uses the mean of the fingertips and metacarpophalangeal parth of the hand
 
     Parameters:
-        landmark: A list containing the current position of the fingers' landmarks.
+        landmark: A (21, 3) landmark array, or a (N, 21, 3) stack of them
 
     Returns:
-        float: The percentage of zoom
+        The percentage of zoom, 0 while the thumb and index finger pinch; an array for a stack
 
     Example:
         >>> get_zoom(landmark)
-        95.2322%
+        95.2322
     """
-    if (
-        (landmark[8].x - landmark[4].x) ** 2 + (landmark[8].y - landmark[4].y) ** 2
-    ) < 0.004:
-        return 0
-    reference = landmark[5].x - landmark[17].x
-    mean_fingers_y = statistics.mean(
-        [
-            landmark[12].y,
-            landmark[8].y,
-            landmark[16].y,
-            landmark[20].y,
-        ]
-    )
-    mean_hand_y = statistics.mean(
-        [
-            landmark[5].y,
-            landmark[9].y,
-            landmark[13].y,
-            landmark[17].y,
-        ]
-    )
+    x = landmark[..., X]
+    y = landmark[..., Y]
+    pinch = ((x[..., 8] - x[..., 4]) ** 2 + (y[..., 8] - y[..., 4]) ** 2) < 0.004
+    reference = x[..., 5] - x[..., 17]
+    mean_fingers_y = y[..., [12, 8, 16, 20]].mean(axis=-1)
+    mean_hand_y = y[..., MCP].mean(axis=-1)
     distance = mean_hand_y - mean_fingers_y
-    return distance / reference * 100
-
-
-def get_cursor(landmark) -> dict[str, float]:
-    x = ( landmark[8].x-landmark[5].x ) / (abs( landmark[17].x - landmark[5].x ))
-    x /=3
-    x = round(x+0.5,3)
-    if x > 1: x = 1
-    if x < 0: x = 0
-
-    mean_mcp_y = statistics.mean([
-        landmark[5].y,
-        landmark[9].y,
-        landmark[13].y,
-        landmark[17].y,
-    ])
-    reference_y =  abs( landmark[0].y - round( mean_mcp_y  , 2))
-    range_y = landmark[8].y - landmark[6].y
-    y = range_y / reference_y / 2
-    y = -y
-    y = 0.5 +y
-
-    if (y < 0): y = 0
-    if (y > 1): y = 1
-    y = round( y, 3)
-
-    if (y < 0): y = 0
-    if (y > 1): y = 1
-
-    
-    #print(y)
-    return {
-        'x':x,
-        'y':y,
-    }
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zoom = finite_or(distance / reference * 100, 0.0)
+    return np.where(pinch, 0.0, zoom)
+
+
+def get_cursor(landmark) -> np.ndarray:
+    """
+    Maps the index finger, relative to the palm, to a screen position
+
+    Parameters:
+        landmark: A (21, 3) landmark array, or a (N, 21, 3) stack of them
+
+    Returns:
+        The [x, y] position, each in [0, 1]; a (N, 2) array for a stack
+    """
+    x = landmark[..., X]
+    y = landmark[..., Y]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cursor_x = finite_or((x[..., 8] - x[..., 5]) / np.abs(x[..., 17] - x[..., 5]), 0.0)
+    cursor_x /= 3
+    cursor_x = np.clip(np.round(cursor_x + 0.5, 3), 0, 1)
+
+    mean_mcp_y = y[..., MCP].mean(axis=-1)
+    reference_y = np.abs(y[..., 0] - np.round(mean_mcp_y, 2))
+    range_y = y[..., 8] - y[..., 6]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cursor_y = 0.5 - finite_or(range_y / reference_y, 0.0) / 2
+    cursor_y = np.clip(np.round(np.clip(cursor_y, 0, 1), 3), 0, 1)
+
+    return np.stack([cursor_x, cursor_y], axis=-1)
 
 
 def set_reference(landmark, reference: list) -> None:
@@ -175,7 +165,7 @@ def set_reference(landmark, reference: list) -> None:
     This function calculates a distance of reference to calculate the angular velocity
 
     Parameters:
-        landmarks: A list containing the current position of the fingers' landmarks.
+        landmark: A (21, 3) landmark array
         reference: A list which will save the points of reference
 
     Returns:
@@ -184,11 +174,9 @@ def set_reference(landmark, reference: list) -> None:
     Example:
         >>> set_reference(landmark, reference)
     """
-    reference[0] = landmark[8].x
-    reference[1] = landmark[8].y
-    reference[2] = math.sqrt(
-        (landmark[5].x - landmark[17].x) ** 2 + (landmark[5].y - landmark[17].y) ** 2
-    )
+    reference[0] = float(landmark[8, X])
+    reference[1] = float(landmark[8, Y])
+    reference[2] = math.hypot(landmark[5, X] - landmark[17, X], landmark[5, Y] - landmark[17, Y])
     print(f"reference distance: {reference[2]}")
 
 
@@ -197,7 +185,7 @@ def detect_right_gesture(hand_landmarks) -> str:
     This function detects the right hand gestures, actually process just the click gesture
 
     Parameters:
-        hand_landmarks: A list containing the current position of the fingers' landmarks.
+        hand_landmarks: A (21, 3) landmark array
 
     Returns:
         A string with the current hands' gesture
@@ -216,7 +204,7 @@ def detect_left_gesture(hand_landmarks) -> str:
     This function detects the left hand gestures, actually process just the click gesture
 
     Parameters:
-        hand_landmarks: A list containing the current position of the fingers' landmarks.
+        hand_landmarks: A (21, 3) landmark array
 
     Returns:
         A string with the current hands' gesture
@@ -230,137 +218,169 @@ def detect_left_gesture(hand_landmarks) -> str:
     return "none"
 
 
+def hand_features(left_hands: list[dict], right_hands: list[dict]) -> None:
+    """
+    Computes the gesture features of many hands in one vectorized pass
+
+    The landmarks of each side are stacked into a (N, 21, 3) array, so any number of hands cost one
+    call per kernel.
+
+    Parameters:
+        left_hands: Left hand dicts, get 'gesture' and 'zoom'
+        right_hands: Right hand dicts, get 'gesture' and 'cursor'
+
+    Returns:
+        None, the features are stored in each hand dict
+
+    Example:
+        >>> hand_features([left_a, left_b], [right_a])
+        >>> right_a['gesture']
+        'click'
+    """
+    if right_hands:
+        stack = np.stack([hand["landmark"] for hand in right_hands])
+        clicks = is_click(stack, side="right")
+        cursors = get_cursor(stack)
+        for hand, click, cursor in zip(right_hands, clicks, cursors):
+            hand["gesture"] = "click" if click else "none"
+            hand["cursor"] = cursor
+    if left_hands:
+        stack = np.stack([hand["landmark"] for hand in left_hands])
+        clicks = is_click(stack, side="left")
+        zooms = get_zoom(stack)
+        for hand, click, zoom in zip(left_hands, clicks, zooms):
+            hand["gesture"] = "click" if click else "none"
+            hand["zoom"] = zoom
+
+
+# How long a gesture must be held, in milliseconds. Trackers run on frame timestamps, so these hold
+# at any frame rate; they match what the old frame counters meant at 30 fps.
+CLICK_MS = 200
+SELECT_MS = 1000
+SWITCH_MS = 350
+# A longer gap between two frames of a hand means it was lost, the hold starts over
+MAX_FRAME_GAP_MS = 250
+
+# (state, gesture, held for at least ms, next state, action). The first matching row wins.
+RIGHT_HAND_TRANSITIONS = [
+    ("none", "click", 0, "click", None),
+    ("click", "click", CLICK_MS, "prepare", None),
+    ("click", "none", 0, "none", None),
+    ("prepare", "click", SELECT_MS, "select", "select"),
+    ("prepare", "none", 0, "none", "click"),
+    ("select", "click", 0, "select", "select"),
+    ("select", "none", 0, "none", "deselect"),
+]
+
+LEFT_HAND_TRANSITIONS = [
+    ("none", "click", SWITCH_MS, "rotation", "reference"),
+    ("rotation", "click", 0, "rotation", "rotation"),
+    ("rotation", "none", SWITCH_MS, "zoom", None),
+    ("zoom", "click", SWITCH_MS, "rotation", "reference"),
+    ("zoom", "none", 0, "zoom", "zoom"),
+]
+
+
+def step(tracker: dict[str, any], gesture: str, now: float, transitions: list) -> str | None:
+    """
+    Advances a tracker by one frame following a transition table
+
+    Parameters:
+        tracker (Dict[str, Any]): The hand's state: label, current gesture, when it started and the last frame's time.
+        gesture (str): The gesture detected in this frame.
+        now (float): The frame's timestamp in milliseconds.
+        transitions (list): RIGHT_HAND_TRANSITIONS or LEFT_HAND_TRANSITIONS.
+
+    Returns:
+        The action of the matching row, or None
+
+    Example:
+        >>> step(tracker, 'click', 1200.0, RIGHT_HAND_TRANSITIONS)
+        'select'
+    """
+    if (
+        tracker["gesture"] != gesture
+        or tracker["last_seen"] is None
+        or now - tracker["last_seen"] > MAX_FRAME_GAP_MS
+    ):
+        tracker["gesture"] = gesture
+        tracker["since"] = now
+    tracker["last_seen"] = now
+    held = now - tracker["since"]
+
+    for state, on, min_ms, next_state, action in transitions:
+        if state == tracker["label"] and on == gesture and held >= min_ms:
+            tracker["label"] = next_state
+            return action
+    return None
+
+
 def process_right_hand(
-    send: dict[str, any], right_hand: dict[str, any], tracker: dict[str, any]
+    send: dict[str, any], right_hand: dict[str, any], tracker: dict[str, any], now: float
 ) -> None:
     """
     Models a state machine to handle the following states: 'none', 'click', 'prepare', and 'select'.
 
-    This function processes the right hand's position and updates the state based on tracker data.
+    This function processes the right hand's position and updates the state following RIGHT_HAND_TRANSITIONS.
 
     Parameters:
         send (Dict[str, Any]): The object to be transformed into JSON and sent/processed further.
         right_hand (Dict[str, Any]): Dictionary containing information about the right hand's position.
         tracker (Dict[str, Any]): Dictionary containing information needed to transition between states.
+        now (float): The frame's timestamp in milliseconds.
 
     Returns:
         None: This function modifies the internal state and possibly sends data, but does not return a value.
 
     Example:
-        >>> process_right_hand(send_data, right_hand_data, tracker_data)
-
-    """
-    # get_cursor(right_hand['landmark'].landmark)
-    send["cursor"] = get_cursor(right_hand["landmark"].landmark)
-    gesture: str = detect_right_gesture(right_hand["landmark"].landmark)
-    # print(gesture)
-    if tracker["label"] == "none":
-        if gesture == "click":
-            tracker["counter_click"] += 1
-            tracker["label"] = "click"
-    elif tracker["label"] == "click":
-        if gesture == "click":
-            tracker["counter_click"] += 1
-            if tracker["counter_click"] > 5:
-                tracker["label"] = "prepare"
-        else:
-            tracker["counter_click"] = 0
-            tracker["label"] = "none"
-    elif tracker["label"] == "prepare":
-        if gesture == "click":
-            tracker["counter_click"] += 1
-            if tracker["counter_click"] > 30:
-                # print('select')
-                tracker["label"] = "select"
-                send["right_gesture"] = "select"
-        else:
-            send["right_gesture"] = "click"
-            # print ('click')
-            tracker["label"] = "none"
-            tracker["counter_click"] = 0
-    elif tracker["label"] == "select":
-        if gesture == "click":
-            send["right_gesture"] = "select"
-        elif gesture == "click":
-            # print('deselect')
-            send["right_gesture"] = "deselect"
-            tracker["label"] = "none"
-            tracker["counter_click"] = 0
+        >>> process_right_hand(send_data, right_hand_data, tracker_data, 1200.0)
+
+    """
+    if "gesture" not in right_hand:
+        hand_features([], [right_hand])
+    x, y = right_hand["cursor"]
+    send["cursor"] = {"x": float(x), "y": float(y)}
+    gesture: str = right_hand["gesture"]
+    action = step(tracker, gesture, now, RIGHT_HAND_TRANSITIONS)
+    if action:
+        send["right_gesture"] = action
 
 
 def process_left_hand(
-    send: dict[str, any], left_hand: dict[str, any], tracker: dict[str, any]
+    send: dict[str, any], left_hand: dict[str, any], tracker: dict[str, any], now: float
 ) -> None:
     """
-    Models a state machine to handle the following states: 'rotation', 'click', 'zoom', and 'switch'.
+    Models a state machine to handle the following states: 'none', 'rotation' and 'zoom'.
+
+    This function processes the left hand's position and updates the state following LEFT_HAND_TRANSITIONS.
+    Holding the 'L' switches to rotation, releasing it for a moment switches to zoom.
 
-    This function processes the left hand's position and updates the state based on tracker data.
-    
     Parameters:
         send (Dict[str, Any]): The object to be transformed into JSON and sent/processed further.
-        left_hand (Dict[str, Any]): Dictionary containing information about the right hand's position.
+        left_hand (Dict[str, Any]): Dictionary containing information about the left hand's position.
         tracker (Dict[str, Any]): Dictionary containing information needed to transition between states.
+        now (float): The frame's timestamp in milliseconds.
 
     Returns:
         None: This function modifies the internal state and possibly sends data, but does not return a value.
 
     Example:
-        >>> process_right_hand(send_data, left_hand_data, tracker_data)
-    """
-    gesture: str =detect_left_gesture(left_hand['landmark'].landmark)
-    if (tracker['label'] == 'rotation'):
-        #print('rotation')
-        if (gesture=='click'):
-            tracker['counter_no_click'] = 0
-            dx, dy = get_rotation(left_hand['landmark'].landmark, tracker['reference'])
-            #print(f"{dx}\n{dy}")
-            send['rotation'] = {
-                'dx':dx,
-                'dy':dy,
-            }
-        else:
-            if (tracker['counter_no_click'] > 10):
-                tracker['last_mode'] = 'rotation'
-                tracker['counter_no_click'] = 0
-                tracker['label'] = 'zoom'
-                tracker['counter_click'] = 16
-            else: tracker['counter_no_click'] += 1
-    elif (tracker['label'] == 'zoom'):
-        if (gesture == 'click' and tracker['counter_no_click'] > 0):
-            tracker['counter_click'] += 1
-            if (tracker['counter_click'] > 10):
-                tracker['last_mode'] = 'zoom'
-                tracker['label'] = 'rotation'
-        else: 
-            send['zoom'] = get_zoom(left_hand['landmark'].landmark)
-            tracker['counter_click'] = 0
-            tracker['counter_no_click'] = 1
-
-    elif (tracker['label'] == 'switch'):
-        if (gesture == 'click'):
-            tracker['counter_click'] += 1
-            if (tracker['counter_click'] > 15 and 10< tracker['counter_no_click'] < 30):
-                if (tracker['last_mode'] == 'rotation'): tracker['label'] = 'zoom'
-                else:
-                    tracker['label'] = 'rotation'
-                    set_reference(left_hand['landmark'].landmark,tracker['reference'])
-                tracker['counter_click'] = 0
-                tracker['counter_no_click'] = 0
-            elif (tracker['counter_click'] > 30):
-                tracker['label'] = 'rotation'
-            else:
-                tracker['counter_no_click'] = 0
-        else: 
-            if (tracker['counter_no_click'] < 15):
-                tracker['counter_no_click'] += 1
-            else:
-                tracker['counter_click'] = 0
-    else:
-        if (gesture == 'click'):
-            tracker['counter_click'] += 1
-            if (tracker['counter_click'] > 10):
-                tracker['label'] = 'rotation'
-                set_reference(left_hand['landmark'].landmark,tracker['reference'])
+        >>> process_left_hand(send_data, left_hand_data, tracker_data, 1200.0)
+    """
+    if 'gesture' not in left_hand:
+        hand_features([left_hand], [])
+    gesture: str = left_hand['gesture']
+    action = step(tracker, gesture, now, LEFT_HAND_TRANSITIONS)
+    if (action == 'rotation'):
+        dx, dy = get_rotation(left_hand['landmark'], tracker['reference'])
+        send['rotation'] = {
+            'dx': float(dx),
+            'dy': float(dy),
+        }
+    elif (action == 'zoom'):
+        send['zoom'] = float(left_hand['zoom'])
+    elif (action == 'reference'):
+        set_reference(left_hand['landmark'], tracker['reference'])
 
 
 def preprocess_frame(frame):
@@ -373,39 +393,147 @@ def preprocess_frame(frame):
     return frame_rgb
 
 
-def get_gesture(left_tracker, right_tracker, frame, hands):
-    frame = cv2.flip(frame, 1)  # TODO: do we still have to do this
-    processed_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = hands.process(processed_frame)
+def detect_hands(frame, hands, window=None) -> tuple[dict, dict]:
+    """
+    Runs mediapipe on the frame and sorts the hands found by handedness
+
+    Parameters:
+        frame: The RGB image to run inference on, the full frame or a crop of it
+        hands: The session's mediapipe Hands
+        window: When frame is a crop, its (x, y, width, height) in the full frame
 
-    cv2.imwrite("frame.jpg", processed_frame)
+    Returns:
+        The left and right hand dicts, with landmarks in full frame coordinates
+    """
+    results = hands.process(frame)
 
     left_hand = {}
     right_hand = {}
 
-    send = {}
     if results.multi_hand_landmarks:
         for hand_landmarks, hand_handedness in zip(
             results.multi_hand_landmarks, results.multi_handedness
         ):
-            if hand_handedness.classification[0].label == "Right":
-                right_hand = {
-                    "landmark": hand_landmarks,
-                    "handedness": hand_handedness,
-                }
-            else:
-                left_hand = {
-                    "landmark": hand_landmarks,
-                    "handedness": hand_handedness,
-                }
-
-        if right_hand:
-            send["cursor"] = {
-                "x": right_hand["landmark"].landmark[8].x,
-                "y": right_hand["landmark"].landmark[8].y,
+            label = hand_handedness.classification[0].label
+            # Converted once here, every gesture feature reads from the array
+            landmark = landmarks_to_array(hand_landmarks)
+            if window is not None:
+                landmark = to_frame_coordinates(landmark, window)
+            hand = {
+                "landmark": landmark,
+                "handedness": label,
             }
-            process_right_hand(send, right_hand, right_tracker)
-        if left_hand:
-            process_left_hand(send, left_hand, left_tracker)
+            if label == "Right":
+                right_hand = hand
+            else:
+                left_hand = hand
+
+    return left_hand, right_hand
+
+
+def find_hands(frame, hands, mirrored=False, roi=None, idle=None, scanner=None) -> tuple[dict, dict]:
+    """
+    Finds the hands of a frame, using and updating the session's ROI and idle state
+
+    Parameters:
+        frame: The RGB frame, see frames.decode_frame
+        hands: The session's mediapipe Hands
+        mirrored: The client already mirrored the frame
+        roi, idle: The session's ROI and idle state, None to disable them
+        scanner: A static image mode Hands for the periodic full scans while the ROI is in use, None to skip
+                 them
+
+    Returns:
+        The left and right hand dicts, empty when the hand is not in the frame
+    """
+    processed_frame = frame if mirrored else cv2.flip(frame, 1)
+    if is_idle(idle):
+        # Nobody is gesturing, a small probe is enough to notice a hand coming in
+        processed_frame = probe_frame(processed_frame)
+
+    found = None
+    if should_use_roi(roi):
+        # Only the window around the hands goes through inference. It stays fixed while they move inside
+        # it, so mediapipe keeps tracking them from frame to frame.
+        enter_geometry(roi, hands, roi["window"])
+        crop, window = crop_to_roi(processed_frame, roi["window"])
+        left_hand, right_hand = detect_hands(crop, hands, window)
+        found = [hand for hand in (left_hand, right_hand) if hand]
+        if len(found) < roi["hands"]:
+            found = None
+        elif scanner is not None and should_scan(roi):
+            # Hands outside the window are looked for with a separate static detector, the tracker keeps
+            # following the window
+            scan_left, scan_right = detect_hands(processed_frame, scanner)
+            scanned = [hand for hand in (scan_left, scan_right) if hand]
+            if len(scanned) > len(found):
+                left_hand, right_hand, found = scan_left, scan_right, scanned
+
+    if found is None:
+        enter_geometry(roi, hands, FULL_FRAME)
+        left_hand, right_hand = detect_hands(processed_frame, hands)
+        found = [hand for hand in (left_hand, right_hand) if hand]
+
+    # Always the whole frame, with the landmarks mapped back to it, even when inference ran on a crop
+    capture_frame(processed_frame, found)
+
+    update_roi(roi, [hand["landmark"] for hand in found])
+    update_idle(idle, bool(found))
+
+    return left_hand, right_hand
+
+
+def get_gesture(left_tracker, right_tracker, frame, hands, now, mirrored=False, roi=None, idle=None, scanner=None):
+    left_hand, right_hand = find_hands(frame, hands, mirrored, roi, idle, scanner)
+    send = track_hands(left_tracker, right_tracker, left_hand, right_hand, now)
+    send["idle"] = is_idle(idle)
+    return send
+
+
+def track_hands(left_tracker, right_tracker, left_hand, right_hand, now: float) -> dict[str, any]:
+    """
+    Runs both hands' state machines for one frame
+
+    Parameters:
+        left_tracker, right_tracker: The session's trackers, updated in place
+        left_hand, right_hand: {'landmark': (21, 3) array, 'handedness': label} or an empty dict when the hand is not in the frame
+        now: The frame's timestamp in milliseconds
+
+    Returns:
+        The object to be sent: cursor, right_gesture, rotation and zoom when they apply
+    """
+    send = {}
+    if right_hand:
+        send["cursor"] = {
+            "x": float(right_hand["landmark"][8, X]),
+            "y": float(right_hand["landmark"][8, Y]),
+        }
+        process_right_hand(send, right_hand, right_tracker, now)
+    if left_hand:
+        process_left_hand(send, left_hand, left_tracker, now)
 
     return send
+
+
+def hands_from_points(hands: list[tuple[str, list[list[float]]]]) -> tuple[dict, dict]:
+    """
+    Turns landmarks computed on the client into the hands track_hands expects
+
+    Parameters:
+        hands: (handedness, 21 [x, y, z] points) per hand, handedness being 'Left' or 'Right'
+
+    Returns:
+        The left and right hand dicts expected by track_hands
+    """
+    left_hand = {}
+    right_hand = {}
+    for handedness, points in hands:
+        hand = {
+            "landmark": np.asarray(points, dtype=np.float64),
+            "handedness": handedness,
+        }
+        if handedness == "Right":
+            right_hand = hand
+        else:
+            left_hand = hand
+    return left_hand, right_hand
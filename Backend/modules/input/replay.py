@@ -0,0 +1,290 @@
+"""
+Replays recorded input through the gesture pipeline as fast as it runs and reports how fast that is
+
+Run from the Backend folder:
+
+    python -m modules.input.replay video.mp4
+    python -m modules.input.replay debug_frames/20241005-181500 --golden golden.json
+    python -m modules.input.replay --landmarks landmarks.json --write-golden golden.json
+
+A video or a folder of images goes through decoding, mediapipe and the state machines like the frames
+of a session; a landmarks file (a list of {'time', 'hands'}, like the landmarks.json of a debug dump)
+only goes through the state machines, like /get_action_landmarks.
+
+A debug dump (a folder with a landmarks.json) is always replayed as mirrored, since its frames were
+captured after mirroring. It only holds one in every GESTURE_DEBUG_CAPTURE_EVERY frames, so the gaps
+between its frames are wider than in the live session: tracking restarts and timed gestures come out
+differently. It is good for timing inference on real frames and for golden files recorded from the same
+dump, not for reproducing what the session's client received.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import cv2
+from .frames import decode_frame
+from .models import FrameFormat
+from .processor import find_hands, track_hands, hands_from_points
+from .roi import new_roi_state, ROI_ENABLED
+from .idle import new_idle_state, is_idle
+from .workers import percentiles
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+STAGES = ["decode", "preprocess", "inference", "state_machine"]
+# Floats are compared up to this difference against the golden file
+TOLERANCE = 1e-4
+
+
+class TimedHands:
+    """
+    Wraps mediapipe's Hands to time inference apart from the rest of find_hands
+    """
+
+    def __init__(self, hands):
+        self.hands = hands
+        self.elapsed = 0.0
+
+    def process(self, frame):
+        start = time.perf_counter()
+        try:
+            return self.hands.process(frame)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+    def reset(self) -> None:
+        self.hands.reset()
+
+
+def new_hands(static_image_mode: bool = False):
+    # Same settings as the sessions' Hands, always in process: the replay measures the pipeline itself
+    import mediapipe as mp
+
+    return mp.solutions.hands.Hands(
+        static_image_mode=static_image_mode,
+        max_num_hands=2,
+        min_detection_confidence=0.7,
+        min_tracking_confidence=0.5,
+    )
+
+
+def read_video(path: str, fps: float):
+    # Yields (timestamp in ms, frame bytes, frame format); frames are handed over raw, as a client would
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise SystemExit(f"Cannot open video '{path}'")
+    fps = capture.get(cv2.CAP_PROP_FPS) or fps
+    i = 0
+    try:
+        while True:
+            start = time.perf_counter()
+            ok, frame = capture.read()
+            if not ok:
+                break
+            height, width = frame.shape[:2]
+            # Container decoding is part of the decode stage, reported alongside decode_frame
+            read_seconds = time.perf_counter() - start
+            yield i * 1000 / fps, frame.tobytes(), FrameFormat(format="bgr", width=width, height=height), read_seconds
+            i += 1
+    finally:
+        capture.release()
+
+
+def is_debug_dump(path: str) -> bool:
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, "landmarks.json"))
+
+
+def read_folder(path: str, fps: float):
+    # Debug dumps carry the capture time of each frame, plain folders get one every 1/fps seconds
+    index_path = os.path.join(path, "landmarks.json")
+    if os.path.exists(index_path):
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        first = index[0]["time"] if index else 0
+        entries = [((entry["time"] - first) * 1000, entry["file"]) for entry in index]
+    else:
+        files = sorted(name for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS))
+        entries = [(i * 1000 / fps, name) for i, name in enumerate(files)]
+
+    for now, name in entries:
+        with open(os.path.join(path, name), "rb") as f:
+            yield now, f.read(), FrameFormat(), 0.0
+
+
+def read_landmarks(path: str, fps: float):
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    first = entries[0]["time"] if entries and "time" in entries[0] else 0
+    for i, entry in enumerate(entries):
+        now = (entry["time"] - first) * 1000 if "time" in entry else i * 1000 / fps
+        yield now, [(hand["handedness"], hand["landmark"]) for hand in entry["hands"]]
+
+
+def to_output(send: dict) -> dict:
+    # Only what the client gets, in plain JSON types, so it can be written to and compared with a golden file
+    output = {"right_gesture": send.get("right_gesture", "none"), "idle": send.get("idle", False)}
+    for key in ("cursor", "rotation"):
+        if key in send:
+            output[key] = {name: round(float(value), 6) for name, value in send[key].items()}
+    if "zoom" in send:
+        output["zoom"] = round(float(send["zoom"]), 6)
+    return output
+
+
+def replay_frames(frames, mirrored: bool = False) -> tuple[list[dict], dict[str, list[float]]]:
+    """
+    Runs frames through decoding, mediapipe and the state machines, the way a session would
+
+    Parameters:
+        frames: (timestamp in ms, frame bytes, frame format, seconds already spent reading) per frame
+        mirrored: The frames are already mirrored
+
+    Returns:
+        The output of every frame and the seconds every stage took per frame
+    """
+    hands = TimedHands(new_hands())
+    scanner = TimedHands(new_hands(static_image_mode=True)) if ROI_ENABLED else None
+    left_tracker, right_tracker = new_trackers()
+    roi = new_roi_state()
+    idle = new_idle_state()
+    outputs = []
+    timings = {stage: [] for stage in STAGES}
+
+    for now, data, frame_format, read_seconds in frames:
+        start = time.perf_counter()
+        img = decode_frame(data, frame_format)
+        decoded = time.perf_counter()
+
+        hands.elapsed = 0.0
+        if scanner is not None:
+            scanner.elapsed = 0.0
+        left_hand, right_hand = find_hands(img, hands, mirrored, roi, idle, scanner)
+        found = time.perf_counter()
+
+        send = track_hands(left_tracker, right_tracker, left_hand, right_hand, now)
+        send["idle"] = is_idle(idle)
+        tracked = time.perf_counter()
+
+        timings["decode"].append(read_seconds + decoded - start)
+        inference = hands.elapsed + (scanner.elapsed if scanner is not None else 0.0)
+        timings["inference"].append(inference)
+        timings["preprocess"].append(found - decoded - inference)
+        timings["state_machine"].append(tracked - found)
+        outputs.append(to_output(send))
+
+    return outputs, timings
+
+
+def replay_landmarks(entries) -> tuple[list[dict], dict[str, list[float]]]:
+    """
+    Runs recorded landmarks through the state machines only
+
+    Parameters:
+        entries: (timestamp in ms, [(handedness, 21 [x, y, z] points)]) per frame
+
+    Returns:
+        The output of every frame and the seconds the state machines took per frame
+    """
+    left_tracker, right_tracker = new_trackers()
+    outputs = []
+    timings = {"state_machine": []}
+
+    for now, points in entries:
+        start = time.perf_counter()
+        left_hand, right_hand = hands_from_points(points)
+        send = track_hands(left_tracker, right_tracker, left_hand, right_hand, now)
+        timings["state_machine"].append(time.perf_counter() - start)
+        outputs.append(to_output(send))
+
+    return outputs, timings
+
+
+def new_trackers() -> tuple[dict, dict]:
+    # Imported here: sessions pulls in the inference backends, which landmark replays never use
+    from .sessions import new_left_tracker, new_right_tracker
+
+    return new_left_tracker(), new_right_tracker()
+
+
+def same_output(a, b) -> bool:
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same_output(a[key], b[key]) for key in a)
+    if isinstance(a, float) or isinstance(b, float):
+        return isinstance(a, (int, float)) and isinstance(b, (int, float)) and abs(a - b) <= TOLERANCE
+    return a == b
+
+
+def diff_outputs(outputs: list[dict], golden: list[dict]) -> list[str]:
+    """
+    Compares the outputs of a replay with a golden file frame by frame
+
+    Returns:
+        One line per frame that differs, empty when they all match
+    """
+    lines = []
+    if len(outputs) != len(golden):
+        lines.append(f"frame count: got {len(outputs)}, golden has {len(golden)}")
+    for i, (got, expected) in enumerate(zip(outputs, golden)):
+        if not same_output(got, expected):
+            lines.append(f"frame {i}: got {json.dumps(got)}, expected {json.dumps(expected)}")
+    return lines
+
+
+def report(timings: dict[str, list[float]], wall_seconds: float, frames: int) -> None:
+    print(f"frames: {frames}")
+    print(f"wall time: {wall_seconds:.3f} s")
+    print(f"throughput: {frames / wall_seconds if wall_seconds > 0 else 0.0:.1f} frames/s")
+    for stage, samples in timings.items():
+        stats = percentiles([seconds * 1000 for seconds in samples])
+        print(f"{stage:>14}: p50 {stats['p50']:.3f} ms  p95 {stats['p95']:.3f} ms  p99 {stats['p99']:.3f} ms  "
+              f"mean {np.mean(samples) * 1000 if samples else 0.0:.3f} ms")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded input through the gesture pipeline")
+    parser.add_argument("source", nargs="?", help="A video file or a folder of images")
+    parser.add_argument("--landmarks", help="A landmarks JSON file, replayed through the state machines only")
+    parser.add_argument("--fps", type=float, default=30.0, help="Frame rate used when the input has no timestamps")
+    parser.add_argument("--mirrored", action="store_true", help="The frames are already mirrored, implied for a debug dump")
+    parser.add_argument("--golden", help="Compare the outputs with this file, exit with 1 when they differ")
+    parser.add_argument("--write-golden", help="Write the outputs to this file")
+    args = parser.parse_args(argv)
+
+    if (args.source is None) == (args.landmarks is None):
+        parser.error("give either a video or folder, or --landmarks")
+
+    start = time.perf_counter()
+    if args.landmarks:
+        outputs, timings = replay_landmarks(read_landmarks(args.landmarks, args.fps))
+    elif os.path.isdir(args.source):
+        # Debug dumps hold the frames as mirrored for inference
+        mirrored = args.mirrored or is_debug_dump(args.source)
+        outputs, timings = replay_frames(read_folder(args.source, args.fps), mirrored)
+    else:
+        outputs, timings = replay_frames(read_video(args.source, args.fps), args.mirrored)
+    wall_seconds = time.perf_counter() - start
+
+    report(timings, wall_seconds, len(outputs))
+
+    if args.write_golden:
+        with open(args.write_golden, "w", encoding="utf-8") as f:
+            json.dump(outputs, f, indent=1)
+
+    if args.golden:
+        with open(args.golden, encoding="utf-8") as f:
+            golden = json.load(f)
+        differences = diff_outputs(outputs, golden)
+        if differences:
+            print(f"{len(differences)} differences with {args.golden}:")
+            for line in differences[:50]:
+                print(f"  {line}")
+            return 1
+        print(f"matches {args.golden}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
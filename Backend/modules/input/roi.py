@@ -0,0 +1,145 @@
+import os
+import cv2
+
+
+# Off by default: in video mode mediapipe already runs its landmark model on a crop around the tracked
+# hands, so the window mostly saves work on palm detections
+ROI_ENABLED = os.getenv("GESTURE_ROI", "0") == "1"
+# Room around the hands' box when a window is placed, as a fraction of the box's size on each side. The
+# window stays put while the hands move inside it, so it needs space for them to move.
+ROI_MARGIN = float(os.getenv("GESTURE_ROI_MARGIN", "1.5"))
+# Longest side the crop is downscaled to before inference
+ROI_MAX_SIDE = int(os.getenv("GESTURE_ROI_MAX_SIDE", "320"))
+# While fewer than MAX_HANDS are tracked, every this many frames the whole frame is scanned by a separate
+# static detector, so a hand entering elsewhere is found without disturbing the tracker
+ROI_FULL_SCAN_EVERY = int(os.getenv("GESTURE_ROI_FULL_SCAN_EVERY", "15"))
+# A window covering more than this fraction of the frame is not worth cropping
+ROI_MAX_AREA = 0.6
+MAX_HANDS = 2
+
+FULL_FRAME = (0.0, 0.0, 1.0, 1.0)
+
+
+def new_roi_state() -> dict:
+    return {
+        # (x, y, width, height) of the crop, normalized to the full frame; fixed until the hands leave it
+        "window": None,
+        # Where the session's Hands last ran, FULL_FRAME or a window; its tracking only holds within one
+        "geometry": None,
+        "hands": 0,
+        "frames": 0,
+    }
+
+
+def should_use_roi(roi: dict | None) -> bool:
+    return ROI_ENABLED and roi is not None and roi["window"] is not None
+
+
+def should_scan(roi: dict | None) -> bool:
+    # With every hand tracked there is nothing left to find
+    return should_use_roi(roi) and roi["hands"] < MAX_HANDS and roi["frames"] % ROI_FULL_SCAN_EVERY == 0
+
+
+def enter_geometry(roi: dict | None, hands, window: tuple[float, float, float, float]) -> None:
+    """
+    Resets the Hands' tracking when inference moves to a different window
+
+    In video mode mediapipe tracks each hand from its landmarks in the previous frame. Those are
+    normalized to the image it was given, so they are wrong as soon as the image covers another part of
+    the frame; the tracker starts over with a palm detection instead of following the wrong spot.
+
+    Parameters:
+        roi: The session's ROI state
+        hands: The session's mediapipe Hands
+        window: The window this frame's inference runs on, FULL_FRAME for the whole frame
+    """
+    if roi is None:
+        return
+    if roi["geometry"] is not None and roi["geometry"] != window:
+        hands.reset()
+    roi["geometry"] = window
+
+
+def crop_to_roi(frame, window: tuple[float, float, float, float]):
+    """
+    Cuts the session's window out of the frame and downscales it
+
+    Parameters:
+        frame: The full RGB frame
+        window: (x, y, width, height) of the window, normalized to the full frame
+
+    Returns:
+        The crop and its window, snapped to whole pixels, used to map the landmarks found in the crop back
+
+    Example:
+        >>> crop, window = crop_to_roi(frame, (0.35, 0.2, 0.3, 0.6))
+    """
+    height, width = frame.shape[:2]
+    x, y, window_width, window_height = window
+    left = int(x * width)
+    top = int(y * height)
+    right = int((x + window_width) * width)
+    bottom = int((y + window_height) * height)
+
+    crop = frame[top:bottom, left:right]
+    scale = ROI_MAX_SIDE / max(crop.shape[:2])
+    if scale < 1:
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    return crop, (left / width, top / height, (right - left) / width, (bottom - top) / height)
+
+
+def to_frame_coordinates(landmark, window: tuple[float, float, float, float]):
+    # Normalized crop coordinates back to the full frame; z scales with the width like in mediapipe
+    x, y, width, height = window
+    landmark[:, 0] = x + landmark[:, 0] * width
+    landmark[:, 1] = y + landmark[:, 1] * height
+    landmark[:, 2] = landmark[:, 2] * width
+    return landmark
+
+
+def place_window(box: tuple[float, float, float, float]) -> tuple[float, float, float, float] | None:
+    x_min, y_min, x_max, y_max = box
+    margin_x = (x_max - x_min) * ROI_MARGIN
+    margin_y = (y_max - y_min) * ROI_MARGIN
+    left = max(0.0, x_min - margin_x)
+    top = max(0.0, y_min - margin_y)
+    right = min(1.0, x_max + margin_x)
+    bottom = min(1.0, y_max + margin_y)
+    if (right - left) * (bottom - top) > ROI_MAX_AREA:
+        return None
+    return left, top, right - left, bottom - top
+
+
+def contains(window: tuple[float, float, float, float], box: tuple[float, float, float, float]) -> bool:
+    x, y, width, height = window
+    x_min, y_min, x_max, y_max = box
+    return x <= x_min and y <= y_min and x_max <= x + width and y_max <= y + height
+
+
+def update_roi(roi: dict | None, landmarks: list) -> None:
+    """
+    Keeps the window while the hands stay inside it, and places a new one around them when they leave
+
+    Parameters:
+        roi: The session's ROI state
+        landmarks: The (21, 3) arrays of the hands found, in full frame coordinates
+    """
+    if roi is None:
+        return
+    roi["frames"] += 1
+    hands_before = roi["hands"]
+    roi["hands"] = len(landmarks)
+    if not landmarks:
+        # Tracking lost, next frame is a full scan
+        roi["window"] = None
+        return
+
+    box = (
+        min(float(landmark[:, 0].min()) for landmark in landmarks),
+        min(float(landmark[:, 1].min()) for landmark in landmarks),
+        max(float(landmark[:, 0].max()) for landmark in landmarks),
+        max(float(landmark[:, 1].max()) for landmark in landmarks),
+    )
+    if roi["window"] is None or len(landmarks) != hands_before or not contains(roi["window"], box):
+        roi["window"] = place_window(box)
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from collections import deque
+
+
+RATE_WINDOW = 30
+STALE_SECONDS = 60
+
+# Per session: whether a frame is running, the newest frame waiting for it and when recent frames finished
+schedulers: dict[str, dict] = {}
+
+metrics = {
+    "dropped": 0,
+}
+
+# The loop only keeps weak references to tasks, running drains are held here until they finish
+drain_tasks: set[asyncio.Task] = set()
+
+
+def prune_schedulers(now: float) -> None:
+    for session_id, state in list(schedulers.items()):
+        if not state["running"] and state["pending"] is None and now - state["last_active"] > STALE_SECONDS:
+            del schedulers[session_id]
+
+
+def processing_rate(state: dict) -> float:
+    done = state["done"]
+    if len(done) < 2 or done[-1] == done[0]:
+        return 0.0
+    return (len(done) - 1) / (done[-1] - done[0])
+
+
+async def drain(session_id: str, state: dict) -> None:
+    try:
+        while state["pending"] is not None:
+            fn, args, future = state["pending"]
+            state["pending"] = None
+            if future.done():
+                continue
+
+            try:
+                result = await fn(*args)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+
+            state["done"].append(time.monotonic())
+            if not future.done():
+                future.set_result((result, False))
+    finally:
+        state["running"] = False
+        state["last_active"] = time.monotonic()
+
+
+async def schedule_frame(session_id: str, fn, *args) -> tuple[dict | None, bool, float]:
+    """
+    Runs the newest frame of a session, dropping the ones that piled up behind the running frame
+
+    At most one frame per session is on the worker pool and at most one waits for it. A frame that
+    arrives while another is waiting replaces it, and the replaced one is answered right away as
+    dropped without being decoded.
+
+    Parameters:
+        session_id: The session the frame belongs to
+        fn: The coroutine function handling the frame, awaited as fn(*args)
+
+    Returns:
+        The job's result (None when dropped), whether the frame was dropped and the frames per second
+        the session is actually being processed at
+
+    Example:
+        >>> send, dropped, rate = await schedule_frame("classroom-3", run_batched, "classroom-3", file_bytes, frame_format, now)
+    """
+    now = time.monotonic()
+    state = schedulers.get(session_id)
+    if state is None:
+        prune_schedulers(now)
+        state = {
+            "running": False,
+            "pending": None,
+            "done": deque(maxlen=RATE_WINDOW),
+            "last_active": now,
+        }
+        schedulers[session_id] = state
+    state["last_active"] = now
+
+    future = asyncio.get_running_loop().create_future()
+    if state["pending"] is not None:
+        stale = state["pending"][2]
+        if not stale.done():
+            stale.set_result((None, True))
+            metrics["dropped"] += 1
+    state["pending"] = (fn, args, future)
+
+    if not state["running"]:
+        # Marked before the task starts so the next frame doesn't spawn a second drain
+        state["running"] = True
+        task = asyncio.create_task(drain(session_id, state))
+        drain_tasks.add(task)
+        task.add_done_callback(drain_tasks.discard)
+
+    result, dropped = await future
+    return result, dropped, processing_rate(state)
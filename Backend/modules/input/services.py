@@ -1,42 +1,83 @@
 from fastapi import UploadFile
-import numpy as np
-import cv2
-import mediapipe as mp
-from .processor import get_gesture
+import asyncio
+import time
+from .processor import hands_from_points
+from .frames import validate_frame_format
+from .pipeline import track_frame
+from .batching import run_batched, get_batch_metrics
+from .scheduler import schedule_frame, metrics as scheduler_metrics
+from .workers import run_in_worker, get_metrics
+from .debug import dump_captures
 from .models import *
 
-left_tracker = {
-    "label": "none",
-    "counter_click": 0,
-    "counter_no_click": 0,
-    "reference": [0, 0, 0],
-    "last_mode": "none",
-}
 
-right_tracker = {
-    "label": "none",
-    "counter_click": 0,
-}
+async def process_input(
+    file: UploadFile,
+    session_id: str = "default",
+    frame_format: FrameFormat = FrameFormat(),
+    timestamp: float | None = None,
+    seq: int | None = None,
+) -> InputResponse:
+    now = frame_time(timestamp)
+    file_bytes = await file.read()
+    return await process_frame(file_bytes, session_id, frame_format, now, seq)
 
-hands = mp.solutions.hands.Hands(
-    static_image_mode=False,
-    max_num_hands=2,
-    min_detection_confidence=0.7,
-    min_tracking_confidence=0.5,
-)
 
+async def process_frame(
+    file_bytes: bytes,
+    session_id: str = "default",
+    frame_format: FrameFormat = FrameFormat(),
+    timestamp: float | None = None,
+    seq: int | None = None,
+) -> InputResponse:
+    now = frame_time(timestamp)
+    validate_frame_format(frame_format)
+    # Decoding and inference run on the worker pool, the event loop only waits for the result.
+    # Frames that went stale while waiting come back as dropped without being decoded.
+    send, dropped, rate = await schedule_frame(session_id, run_batched, session_id, file_bytes, frame_format, now)
+    if dropped:
+        return dropped_response(processing_rate=rate, seq=seq)
 
-async def process_input(file: UploadFile) -> tuple[Cursor, str, Rotation, float]:
-    file_bytes = await file.read()
+    return build_response(send, processing_rate=rate, seq=seq)
+
+
+async def process_landmarks(request: LandmarksRequest) -> InputResponse:
+    # No image and no inference, only the state machines; they still run on the session's worker, where
+    # taking the session's lock cannot block the event loop
+    now = frame_time(request.timestamp)
+    left_hand, right_hand = hands_from_points([(hand.handedness, hand.landmark) for hand in request.hands])
+    detected = {"left": left_hand, "right": right_hand, "idle": False}
+    send = await run_in_worker(request.session_id, track_frame, request.session_id, detected, now)
+    return build_response(send)
+
+
+def frame_time(timestamp: float | None) -> float:
+    # Gesture durations run on the client's capture time when it sends one (in ms, for every frame of the
+    # session), otherwise on the time the frame arrived
+    return timestamp if timestamp is not None else time.monotonic() * 1000
 
-    np_array = np.frombuffer(file_bytes, np.uint8)
-    img = cv2.imdecode(np_array, cv2.IMREAD_COLOR)
 
-    send = get_gesture(left_tracker, right_tracker, img,  hands)
+def dropped_response(processing_rate: float = 0, seq: int | None = None, error: str | None = None) -> InputResponse:
+    return InputResponse(cursor=Cursor(), right_gesture="none", rotation=Rotation(), zoom=0.0,
+                         dropped=True, processing_rate=processing_rate, seq=seq, error=error)
 
+
+def build_response(send: dict, processing_rate: float = 0, seq: int | None = None) -> InputResponse:
     cursor = send['cursor'] if 'cursor' in send else Cursor()
     r_gesture = send['right_gesture'] if 'right_gesture' in send else "none"
     rotation = send['rotation'] if 'rotation' in send else Rotation()
     zoom = send['zoom'] if 'zoom' in send else 0.0
+    idle = send['idle'] if 'idle' in send else False
+
+    return InputResponse(cursor=cursor, right_gesture=r_gesture, rotation=rotation, zoom=zoom,
+                         processing_rate=processing_rate, idle=idle, seq=seq)
+
+
+def get_input_metrics() -> InputMetricsResponse:
+    return InputMetricsResponse(**get_metrics(), **get_batch_metrics(), dropped=scheduler_metrics["dropped"])
+
 
-    return cursor, r_gesture, rotation, zoom
+async def dump_debug_frames() -> DebugDumpResponse:
+    # JPEG encoding and disk writes stay off the event loop
+    folder, frames = await asyncio.to_thread(dump_captures)
+    return DebugDumpResponse(folder=folder, frames=frames)
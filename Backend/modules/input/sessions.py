@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from fastapi import HTTPException
+import mediapipe as mp
+from .roi import new_roi_state
+from .idle import new_idle_state
+from .shm import INFERENCE_BACKEND, RemoteHands
+
+
+SESSION_IDLE_SECONDS = float(os.getenv("GESTURE_SESSION_IDLE_SECONDS", "60"))
+HANDS_POOL_SIZE = int(os.getenv("GESTURE_HANDS_POOL_SIZE", "8"))
+
+# Least recently used session first
+sessions: "OrderedDict[str, dict]" = OrderedDict()
+free_hands: list = []
+hands_created = 0
+sessions_lock = threading.Lock()
+# One static image mode Hands per worker thread, for the ROI's full scans; it keeps no state between frames
+scanners = threading.local()
+
+
+def new_hands(static_image_mode: bool = False):
+    if INFERENCE_BACKEND == "process":
+        return RemoteHands(static_image_mode)
+    return mp.solutions.hands.Hands(
+        static_image_mode=static_image_mode,
+        max_num_hands=2,
+        min_detection_confidence=0.7,
+        min_tracking_confidence=0.5,
+    )
+
+
+def thread_scanner():
+    scanner = getattr(scanners, "hands", None)
+    if scanner is None:
+        scanner = scanners.hands = new_hands(static_image_mode=True)
+    return scanner
+
+
+def new_left_tracker() -> dict:
+    return {
+        "label": "none",
+        "gesture": "none",
+        "since": 0.0,
+        "last_seen": None,
+        "reference": [0, 0, 0],
+    }
+
+
+def new_right_tracker() -> dict:
+    return {
+        "label": "none",
+        "gesture": "none",
+        "since": 0.0,
+        "last_seen": None,
+    }
+
+
+def release_session(session: dict) -> None:
+    # Caller holds sessions_lock
+    sessions.pop(session["id"], None)
+    if session["hands"] is not None:
+        free_hands.append(session["hands"])
+
+
+def evict_idle_sessions(now: float) -> None:
+    # Caller holds sessions_lock
+    for session in list(sessions.values()):
+        if now - session["last_seen"] < SESSION_IDLE_SECONDS:
+            break
+        if session["lock"].acquire(blocking=False):
+            release_session(session)
+            session["lock"].release()
+
+
+def reserve_hands():
+    """
+    Picks the pool slot for a new lease; caller holds sessions_lock
+
+    When every instance is leased, the least recently used session that is not processing a frame
+    gives its instance up and is dropped; it will start over with fresh trackers on its next frame.
+
+    Returns:
+        A free instance, still to be reset, or None when a new one is to be created in the slot
+    """
+    global hands_created
+    if not free_hands and hands_created < HANDS_POOL_SIZE:
+        hands_created += 1
+        return None
+
+    if not free_hands:
+        for session in list(sessions.values()):
+            if session["hands"] is not None and session["lock"].acquire(blocking=False):
+                release_session(session)
+                session["lock"].release()
+                break
+        else:
+            raise HTTPException(status_code=503, detail="Too many gesture sessions")
+
+    return free_hands.pop()
+
+
+def acquire_hands():
+    """
+    Takes a Hands instance out of the bounded pool
+
+    Only the choice of slot happens under sessions_lock. Creating or resetting the instance can take
+    long (with RemoteHands it's a round trip to an inference process, and the first one starts them),
+    so it runs after releasing it and other sessions' lookups don't wait for it. Caller doesn't hold
+    sessions_lock.
+    """
+    global hands_created
+    with sessions_lock:
+        hands = reserve_hands()
+    try:
+        if hands is None:
+            return new_hands()
+        # Don't let the previous owner's tracking context leak into this session
+        hands.reset()
+        return hands
+    except Exception:
+        # The slot goes back to the pool; the instance, in an unknown state, is dropped and a fresh one
+        # is created in its place by a later lease
+        with sessions_lock:
+            hands_created -= 1
+        raise
+
+
+def get_session(session_id: str) -> dict:
+    """
+    Returns the gesture state of a client, creating it on the first frame
+
+    Parameters:
+        session_id: An id chosen by the client, stable for the whole interaction
+
+    Returns:
+        A dict with the session's trackers, its Hands instance (None until locked_session leases one) and
+        the lock that serializes its frames
+
+    Example:
+        >>> session = get_session("classroom-3")
+        >>> session["left_tracker"]["label"]
+        'none'
+    """
+    now = time.monotonic()
+    with sessions_lock:
+        evict_idle_sessions(now)
+
+        session = sessions.get(session_id)
+        if session is None:
+            session = {
+                "id": session_id,
+                "left_tracker": new_left_tracker(),
+                "right_tracker": new_right_tracker(),
+                "hands": None,
+                "roi": new_roi_state(),
+                "idle": new_idle_state(),
+                "lock": threading.Lock(),
+                "last_seen": now,
+            }
+            sessions[session_id] = session
+        else:
+            session["last_seen"] = now
+            sessions.move_to_end(session_id)
+
+    return session
+
+
+@contextmanager
+def locked_session(session_id: str, needs_hands: bool = True):
+    """
+    Holds the session's lock while its frame is processed
+
+    A session can be evicted between get_session and taking its lock, in that case a new one is fetched.
+    With needs_hands, a Hands instance is leased once the lock is held: a locked session can't be
+    evicted, so it can be leased without holding sessions_lock. False when the client sends landmarks.
+    """
+    while True:
+        session = get_session(session_id)
+        session["lock"].acquire()
+        if sessions.get(session_id) is session:
+            break
+        session["lock"].release()
+
+    try:
+        if needs_hands and session["hands"] is None:
+            session["hands"] = acquire_hands()
+        yield session
+    finally:
+        session["lock"].release()
@@ -0,0 +1,223 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+from multiprocessing import shared_memory
+from types import SimpleNamespace
+import numpy as np
+from fastapi import HTTPException
+
+
+# "thread" runs mediapipe inside the API process, "process" in separate inference processes
+INFERENCE_BACKEND = os.getenv("GESTURE_INFERENCE_BACKEND", "thread")
+INFERENCE_PROCESSES = int(os.getenv("GESTURE_INFERENCE_PROCESSES", str(os.cpu_count() or 2)))
+SHM_SLOTS = int(os.getenv("GESTURE_SHM_SLOTS", "16"))
+# Big enough for a 1080p RGB frame
+SHM_SLOT_BYTES = int(os.getenv("GESTURE_SHM_SLOT_BYTES", str(1920 * 1080 * 3)))
+INFERENCE_TIMEOUT_SECONDS = 5
+
+backend = {
+    "ring": None,
+    "free_slots": None,
+    "processes": [],
+    "jobs": [],
+    "results": None,
+    "collector": None,
+    "pending": {},
+}
+backend_lock = threading.Lock()
+job_ids = itertools.count()
+handles = itertools.count()
+
+
+class FrameRing:
+    """
+    Fixed slots of shared memory, each holding one frame
+
+    The API process writes a frame into a free slot and only the slot index travels to the inference
+    process, which reads the frame in place.
+    """
+
+    def __init__(self, slots: int, slot_bytes: int, name: str | None = None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def view(self, slot: int, shape: tuple) -> np.ndarray:
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def close(self, unlink: bool = False) -> None:
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def inference_main(ring_name: str, slots: int, slot_bytes: int, jobs, results) -> None:
+    # Runs in each inference process; one Hands per handle, i.e. per leased instance of the pool
+    import mediapipe as mp
+
+    ring = FrameRing(slots, slot_bytes, name=ring_name)
+    # Bounded by the pool of leased instances in sessions.py
+    instances: dict = {}
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, handle, slot, shape, static_image_mode = job
+
+        hands = instances.get(handle)
+        if hands is None:
+            hands = mp.solutions.hands.Hands(
+                static_image_mode=static_image_mode,
+                max_num_hands=2,
+                min_detection_confidence=0.7,
+                min_tracking_confidence=0.5,
+            )
+            instances[handle] = hands
+
+        if slot is None:
+            # Reset request, no frame
+            hands.reset()
+            results.put((job_id, None))
+            continue
+
+        try:
+            output = hands.process(ring.view(slot, shape))
+            # Protobuf messages pickle compactly, only the landmarks cross back
+            results.put((job_id, (output.multi_hand_landmarks, output.multi_handedness)))
+        except Exception as e:
+            results.put((job_id, e))
+
+    ring.close()
+
+
+def collect_results(results) -> None:
+    while True:
+        message = results.get()
+        if message is None:
+            break
+        job_id, payload = message
+        waiter = backend["pending"].pop(job_id, None)
+        if waiter is None:
+            continue
+        if waiter["slot"] is not None:
+            # The process is done reading the frame, also when run_remote gave up waiting for it
+            backend["free_slots"].put(waiter["slot"])
+        waiter["payload"] = payload
+        waiter["event"].set()
+
+
+def start_inference_processes() -> None:
+    with backend_lock:
+        if backend["ring"] is not None:
+            return
+
+        context = multiprocessing.get_context("spawn")
+        ring = FrameRing(SHM_SLOTS, SHM_SLOT_BYTES)
+        free_slots = queue.Queue()
+        for slot in range(SHM_SLOTS):
+            free_slots.put(slot)
+        results = context.Queue()
+
+        for i in range(INFERENCE_PROCESSES):
+            jobs = context.Queue()
+            process = context.Process(
+                target=inference_main,
+                args=(ring.name, SHM_SLOTS, SHM_SLOT_BYTES, jobs, results),
+                name=f"gesture-inference-{i}",
+                daemon=True,
+            )
+            process.start()
+            backend["processes"].append(process)
+            backend["jobs"].append(jobs)
+
+        collector = threading.Thread(target=collect_results, args=(results,), name="gesture-results", daemon=True)
+        collector.start()
+
+        backend["free_slots"] = free_slots
+        backend["results"] = results
+        backend["collector"] = collector
+        backend["ring"] = ring
+
+
+def stop_inference_processes() -> None:
+    with backend_lock:
+        if backend["ring"] is None:
+            return
+        for jobs in backend["jobs"]:
+            jobs.put(None)
+        for process in backend["processes"]:
+            process.join(timeout=2)
+        backend["results"].put(None)
+        backend["ring"].close(unlink=True)
+        backend["pending"].clear()
+        backend.update(ring=None, free_slots=None, processes=[], jobs=[], results=None, collector=None)
+
+
+def run_remote(handle: int, frame: np.ndarray | None, static_image_mode: bool = False):
+    ring: FrameRing = backend["ring"]
+    slot = None
+    if frame is not None:
+        if frame.nbytes > ring.slot_bytes:
+            raise HTTPException(status_code=413, detail="Frame too large for the inference buffers")
+        try:
+            slot = backend["free_slots"].get(timeout=INFERENCE_TIMEOUT_SECONDS)
+        except queue.Empty:
+            raise HTTPException(status_code=503, detail="Inference buffers are busy")
+        # The one copy into shared memory; a downscaled crop is already an array of its own, any other
+        # crop is a view of the frame that this copy gathers
+        ring.view(slot, frame.shape)[...] = frame
+
+    job_id = next(job_ids)
+    # The slot goes back to the pool when the result arrives, see collect_results
+    waiter = {"event": threading.Event(), "payload": None, "slot": slot}
+    backend["pending"][job_id] = waiter
+    try:
+        backend["jobs"][handle % len(backend["jobs"])].put(
+            (job_id, handle, slot, frame.shape if frame is not None else None, static_image_mode)
+        )
+    except Exception:
+        backend["pending"].pop(job_id, None)
+        if slot is not None:
+            backend["free_slots"].put(slot)
+        raise
+
+    if not waiter["event"].wait(INFERENCE_TIMEOUT_SECONDS):
+        if slot is None:
+            backend["pending"].pop(job_id, None)
+        # A frame's waiter stays pending: the process may still be reading the slot, the late result
+        # returns it
+        raise HTTPException(status_code=504, detail="Inference process timed out")
+
+    if isinstance(waiter["payload"], Exception):
+        raise waiter["payload"]
+    return waiter["payload"]
+
+
+class RemoteHands:
+    """
+    Stands in for mediapipe's Hands when inference runs in the inference processes
+
+    Each instance is pinned to one process, where a real Hands keeps its tracking context.
+    """
+
+    def __init__(self, static_image_mode: bool = False):
+        start_inference_processes()
+        self.handle = next(handles)
+        self.static_image_mode = static_image_mode
+
+    def process(self, frame: np.ndarray):
+        multi_hand_landmarks, multi_handedness = run_remote(self.handle, frame, self.static_image_mode)
+        return SimpleNamespace(multi_hand_landmarks=multi_hand_landmarks, multi_handedness=multi_handedness)
+
+    def reset(self) -> None:
+        run_remote(self.handle, None, self.static_image_mode)
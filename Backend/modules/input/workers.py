@@ -0,0 +1,116 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+import numpy as np
+from fastapi import HTTPException
+
+
+WORKER_COUNT = int(os.getenv("GESTURE_WORKERS", str(os.cpu_count() or 2)))
+QUEUE_SIZE = int(os.getenv("GESTURE_QUEUE_SIZE", "8"))
+METRICS_WINDOW = 1000
+
+workers: list[dict] = []
+workers_lock = threading.Lock()
+
+metrics = {
+    "frames": 0,
+    "rejected": 0,
+    "errors": 0,
+    "queue_wait_ms": deque(maxlen=METRICS_WINDOW),
+    "processing_ms": deque(maxlen=METRICS_WINDOW),
+}
+
+
+def set_future(future: asyncio.Future, result, error: Exception | None) -> None:
+    # The request may have been cancelled while the frame was running
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def worker_loop(jobs: queue.Queue) -> None:
+    while True:
+        fn, args, future, loop, queued_at = jobs.get()
+        started = time.perf_counter()
+        result, error = None, None
+        try:
+            result = fn(*args)
+        except Exception as e:
+            error = e
+            metrics["errors"] += 1
+        finished = time.perf_counter()
+
+        metrics["frames"] += 1
+        metrics["queue_wait_ms"].append((started - queued_at) * 1000)
+        metrics["processing_ms"].append((finished - started) * 1000)
+        loop.call_soon_threadsafe(set_future, future, result, error)
+
+
+def start_workers() -> None:
+    with workers_lock:
+        if workers:
+            return
+        for i in range(WORKER_COUNT):
+            jobs = queue.Queue(maxsize=QUEUE_SIZE)
+            thread = threading.Thread(target=worker_loop, args=(jobs,), name=f"gesture-worker-{i}", daemon=True)
+            thread.start()
+            workers.append({"queue": jobs, "thread": thread})
+
+
+async def run_in_worker(session_id: str, fn, *args):
+    """
+    Runs a blocking gesture job on the worker pool and waits for it without blocking the event loop
+
+    Every session is pinned to one worker thread, so its frames run one after the other in arrival
+    order, while different sessions spread over all the workers.
+
+    Parameters:
+        session_id: The session the job belongs to
+        fn: The function to run, called as fn(*args) on the worker thread
+
+    Returns:
+        Whatever fn returns
+
+    Raises:
+        HTTPException: 503 when the session's worker already has QUEUE_SIZE frames waiting
+    """
+    if not workers:
+        start_workers()
+
+    worker = workers[zlib.crc32(session_id.encode()) % len(workers)]
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    try:
+        worker["queue"].put_nowait((fn, args, future, loop, time.perf_counter()))
+    except queue.Full:
+        metrics["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Gesture workers are busy")
+
+    return await future
+
+
+def percentiles(samples: deque) -> dict[str, float]:
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    # list() copies the deque in one step, the workers keep appending meanwhile
+    p50, p95, p99 = np.percentile(np.array(list(samples)), [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+def get_metrics() -> dict:
+    return {
+        "workers": len(workers),
+        "frames": metrics["frames"],
+        "rejected": metrics["rejected"],
+        "errors": metrics["errors"],
+        "queue_depth": [worker["queue"].qsize() for worker in workers],
+        "queue_wait_ms": percentiles(metrics["queue_wait_ms"]),
+        "processing_ms": percentiles(metrics["processing_ms"]),
+    }
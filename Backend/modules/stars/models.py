@@ -6,16 +6,19 @@ class Star(BaseModel):
     y: str
     z: str
     id: str
+    planets: list[str] | None = None
 
 
 class SurroundingsPosRequest(BaseModel):
     ra: float
     dec: float
     dist: float
+    annotate_hosts: bool = False
 
 
 class SurroundingsIdRequest(BaseModel):
     id: str
+    annotate_hosts: bool = False
 
 
 class SurroundingsPosResponse(BaseModel):
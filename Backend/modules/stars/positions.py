@@ -0,0 +1,127 @@
+import asyncio
+import os
+import threading
+import time
+import numpy as np
+from astroquery.gaia import Gaia
+from ..exoplanets.utils import gaia_source_id
+
+
+# Designations kept in memory, found or not; the oldest are dropped past this
+POSITION_INDEX_SIZE = int(os.getenv("STAR_POSITION_INDEX_SIZE", "200000"))
+# Seconds a star Gaia had no distance for is not looked up again
+MISSING_POSITION_TTL = float(os.getenv("STAR_POSITION_MISSING_TTL", "86400"))
+POSITION_CHUNK_SIZE = 200
+
+# Gaia designation -> (ra, dec, distance), filled by every surroundings load and by resolve_positions
+positions: dict[str, tuple[float, float, float]] = {}
+# Gaia designation -> time.monotonic() until which it is known to have no distance
+missing: dict[str, float] = {}
+# Surroundings loads and resolve_positions fill the index from different threads
+positions_lock = threading.Lock()
+
+
+def trim_index() -> None:
+    # Caller holds positions_lock. Dicts keep insertion order, the first key is the oldest; stars without
+    # a distance go first
+    while len(positions) + len(missing) > POSITION_INDEX_SIZE:
+        if missing:
+            missing.pop(next(iter(missing)), None)
+        else:
+            positions.pop(next(iter(positions)), None)
+
+
+def remember_positions(designations, ra, dec, dist) -> None:
+    with positions_lock:
+        for designation, star_ra, star_dec, star_dist in zip(designations, ra, dec, dist):
+            designation = str(designation)
+            positions[designation] = (float(star_ra), float(star_dec), float(star_dist))
+            missing.pop(designation, None)
+        trim_index()
+
+
+def remember_missing(designations: list[str]) -> None:
+    expires = time.monotonic() + MISSING_POSITION_TTL
+    with positions_lock:
+        for designation in designations:
+            # Moved to the end, as the newest
+            missing.pop(designation, None)
+            missing[designation] = expires
+        trim_index()
+
+
+def known_positions(designations: list[str]) -> tuple[dict[str, tuple[float, float, float]], list[str]]:
+    # The positions in the index, and the designations that still have to be looked up
+    now = time.monotonic()
+    found = {}
+    unknown = []
+    with positions_lock:
+        for designation in designations:
+            position = positions.get(designation)
+            if position is not None:
+                found[designation] = position
+            elif missing.get(designation, 0.0) <= now:
+                unknown.append(designation)
+    return found, unknown
+
+
+def query_positions(designations: list[str]) -> None:
+    # One Gaia query per chunk, by source_id, which the archive indexes
+    by_source_id = {}
+    for designation in designations:
+        source_id = gaia_source_id(designation)
+        if source_id.isdigit():
+            by_source_id[source_id] = designation
+
+    source_ids = list(by_source_id)
+    for start in range(0, len(source_ids), POSITION_CHUNK_SIZE):
+        chunk = source_ids[start:start + POSITION_CHUNK_SIZE]
+        query = f"""
+SELECT
+    gaia_source.source_id,
+    gaia_source.ra,
+    gaia_source.dec,
+    gaia_source.distance_gspphot
+FROM gaiadr3.gaia_source
+WHERE gaia_source.source_id IN ({", ".join(chunk)})
+    AND gaia_source.distance_gspphot IS NOT NULL
+"""
+        results = Gaia.launch_job_async(query).get_results()
+        found = [by_source_id[str(source_id)] for source_id in results["source_id"]]
+        remember_positions(found, results["ra"], results["dec"], results["distance_gspphot"])
+        remember_missing(sorted(set(by_source_id[source_id] for source_id in chunk) - set(found)))
+
+
+async def resolve_positions(designations: list[str], ra: float, dec: float, dist: float) -> dict[str, tuple[float, float, float]]:
+    """
+    Cartesian positions of many stars relative to an observer
+
+    Stars seen in a surroundings load are already known; the rest are looked up in Gaia in bulk and
+    remembered for next time.
+
+    Parameters:
+        designations: Gaia designations of the stars
+        ra, dec, dist: The observer's position
+
+    Returns:
+        (x, y, z) by designation, in parsecs from the observer; stars Gaia has no distance for are left out
+
+    Example:
+        >>> await resolve_positions(["Gaia DR3 4472832130942575872"], 185.18, 17.79, 18.3)
+        {'Gaia DR3 4472832130942575872': (-3.1, 0.4, 1.2)}
+    """
+    # Imported here, services imports this module to fill the index
+    from .services import celestial_to_cartesian
+
+    found, unknown = known_positions(list(dict.fromkeys(designations)))
+    if unknown:
+        await asyncio.to_thread(query_positions, unknown)
+        found.update(known_positions(unknown)[0])
+    if not found:
+        return {}
+
+    stars = np.array(list(found.values()), dtype=np.float64)
+    x, y, z = celestial_to_cartesian(stars[:, 0], stars[:, 1], stars[:, 2])
+    origin_x, origin_y, origin_z = celestial_to_cartesian(ra, dec, dist)
+    relative = np.column_stack((x - origin_x, y - origin_y, z - origin_z))
+    return {designation: tuple(map(float, point)) for designation, point in zip(found, relative)}
@@ -3,6 +3,9 @@ from astropy.table import Row
 from astropy.coordinates import SkyCoord
 from astroquery.gaia import Gaia
 from .models import Star
+from .positions import remember_positions
+from ..exoplanets.services import load_host_index
+from ..exoplanets.utils import gaia_source_id
 import pyvo
 import astropy.units as u
 import numpy as np
@@ -21,12 +24,14 @@ def celestial_to_cartesian(ra, dec, distance):
 
 
 async def load_around_position(
-    ra, dec, dist, srange=20, magLimit=6.5, searchRadius=360
+    ra, dec, dist, srange=20, magLimit=6.5, searchRadius=360, annotate_hosts=False
 ) -> list[Star]:
 
     if ra < 0 or ra > 360 or dec < -90 or dec > 90 or dist < 0:
         raise HTTPException(status_code=406, detail="invalid")
 
+    hosts = await load_host_index() if annotate_hosts else {}
+
     upperBound = dist + srange
     lowerBound = 0
 
@@ -57,9 +62,18 @@ ORDER BY gaia_source.distance_gspphot ASC;
         designation_list = results["DESIGNATION"]
         dist_list = results["distance_gspphot"]
         x, y, z = celestial_to_cartesian(ra_list, dec_list, dist_list)
+        # Saved constellations are drawn from these same stars, their positions are resolved from here
+        remember_positions(designation_list, ra_list, dec_list, dist_list)
         for i in range(len(results)):
+            planets = hosts.get(gaia_source_id(designation_list[i])) if annotate_hosts else None
             stars.append(
-                Star(x=str(x[i]), y=str(y[i]), z=str(z[i]), id=designation_list[i])
+                Star(
+                    x=str(x[i]),
+                    y=str(y[i]),
+                    z=str(z[i]),
+                    id=designation_list[i],
+                    planets=planets,
+                )
             )
 
     except:
@@ -72,7 +86,7 @@ client = pyvo.dal.TAPService("https://exoplanetarchive.ipac.caltech.edu/TAP")
 
 
 # most seem to have a gaia id
-async def load_around_id(id) -> tuple[list[Star], str, float, float, float]:
+async def load_around_id(id, annotate_hosts=False) -> tuple[list[Star], str, float, float, float]:
     query = f"SELECT TOP 1 pl_name, ra, dec, sy_dist FROM ps WHERE gaia_id='{id}'"
     table_exoplanets = client.search(query=query).to_table()
 
@@ -84,6 +98,6 @@ async def load_around_id(id) -> tuple[list[Star], str, float, float, float]:
     ra = exoplanet_row["ra"]
     dec = exoplanet_row["dec"]
     distance = exoplanet_row["sy_dist"]
-    stars = await load_around_position(ra, dec, distance)
+    stars = await load_around_position(ra, dec, distance, annotate_hosts=annotate_hosts)
 
     return stars, name, ra, dec, distance
@@ -0,0 +1,74 @@
+import os
+import time
+from collections import OrderedDict
+from .encoding import merge_rows
+
+
+# Users whose constellations are kept in memory, the least recently used is dropped past this
+CACHE_SIZE = int(os.getenv("CONSTELLATION_CACHE_SIZE", "1024"))
+
+# str(user_id) -> {"version", "rows"}, most recently used last. Views built from the rows (the nested
+# models, the KD-tree) are kept in the entry too and go away with it
+cache: "OrderedDict[str, dict]" = OrderedDict()
+
+state = {
+    # Bumped on every write; a load that saw it change meanwhile may be stale and is not cached
+    "writes": 0,
+    # Versions are milliseconds since the epoch, so they keep growing across restarts
+    "last_version": 0,
+}
+
+
+def new_version() -> int:
+    state["last_version"] = max(state["last_version"] + 1, int(time.time() * 1000))
+    return state["last_version"]
+
+
+def cache_key(user_id: str | int) -> str:
+    # The same user comes as an int from the request bodies and as a string from the auth token
+    return str(user_id)
+
+
+def get_cached(user_id: str | int) -> dict | None:
+    key = cache_key(user_id)
+    entry = cache.get(key)
+    if entry is not None:
+        cache.move_to_end(key)
+    return entry
+
+
+def store(user_id: str | int, rows: dict[str, list[dict]], writes_before: int) -> dict:
+    """
+    Caches the constellations just loaded for a user
+
+    Parameters:
+        user_id: The owner of the constellations
+        rows: The user's rows of the constellations, stars and star_connections tables
+        writes_before: state['writes'] when the load started
+
+    Returns:
+        The entry: {'version', 'rows'}
+    """
+    entry = {"version": new_version(), "rows": rows}
+    if state["writes"] != writes_before:
+        # A constellation was created while loading, the next read goes to the database again
+        return entry
+
+    key = cache_key(user_id)
+    cache[key] = entry
+    cache.move_to_end(key)
+    while len(cache) > CACHE_SIZE:
+        cache.popitem(last=False)
+    return entry
+
+
+def record_write(user_id: str | int, rows: dict[str, list[dict]]) -> None:
+    # Write-through: a cached entry gets the rows just inserted, so the next read stays in memory
+    state["writes"] += 1
+    key = cache_key(user_id)
+    entry = cache.get(key)
+    if entry is not None:
+        cache[key] = {
+            "version": new_version(),
+            "rows": merge_rows(entry["rows"], rows),
+        }
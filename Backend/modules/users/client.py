@@ -0,0 +1,83 @@
+from dotenv import load_dotenv
+from gotrue import AsyncMemoryStorage
+from supabase import acreate_client, AClient, ClientOptions
+import os
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+POSTGREST_TIMEOUT_SECONDS = int(os.getenv("SUPABASE_POSTGREST_TIMEOUT", "10"))
+
+# Both clients are created at startup.
+# "client" serves the data of every request. It never signs in, so its PostgREST client keeps the same
+# headers for everyone while sharing one httpx pool of keep-alive connections.
+# "auth" runs the OAuth login, /callback and /logout. It holds the session that flow creates, and an
+# auth event on it can't change the headers of the data client.
+supabase: dict[str, AClient | None] = {"client": None, "auth": None}
+
+
+def client_options() -> ClientOptions:
+    return ClientOptions(
+        flow_type="pkce",
+        # The async auth client awaits its storage, the default one is synchronous
+        storage=AsyncMemoryStorage(),
+        postgrest_client_timeout=POSTGREST_TIMEOUT_SECONDS,
+    )
+
+
+async def start_supabase() -> AClient:
+    if supabase["client"] is None:
+        supabase["client"] = await acreate_client(SUPABASE_URL, SUPABASE_KEY, options=client_options())
+    if supabase["auth"] is None:
+        supabase["auth"] = await acreate_client(SUPABASE_URL, SUPABASE_KEY, options=client_options())
+    return supabase["client"]
+
+
+async def close_client(client: AClient) -> None:
+    # Every HTTP client the Supabase client opened; storage is only created when first used
+    await client.postgrest.aclose()
+    await client.auth.close()
+    # supabase 2.10 has no public way to tell if storage was created: the property would create it just
+    # to close it. Read the private attribute defensively in case a later version renames it
+    storage = getattr(client, "_storage", None)
+    if storage is not None:
+        await storage.aclose()
+
+
+async def stop_supabase() -> None:
+    for name in ("client", "auth"):
+        client = supabase[name]
+        if client is not None:
+            supabase[name] = None
+            await close_client(client)
+
+
+def get_supabase() -> AClient:
+    """
+    The shared async Supabase client for data, the same for every user
+
+    Returns:
+        The client created by start_supabase
+
+    Example:
+        >>> response = await get_supabase().table("stars").select("*").execute()
+    """
+    if supabase["client"] is None:
+        raise RuntimeError("Supabase client not started, call start_supabase at startup")
+    return supabase["client"]
+
+
+def get_auth_client() -> AClient:
+    """
+    The Supabase client of the OAuth flow, which keeps the session of the user who signed in
+
+    Returns:
+        The auth client created by start_supabase
+
+    Example:
+        >>> response = await get_auth_client().auth.exchange_code_for_session({"auth_code": code})
+    """
+    if supabase["auth"] is None:
+        raise RuntimeError("Supabase client not started, call start_supabase at startup")
+    return supabase["auth"]
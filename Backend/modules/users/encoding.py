@@ -0,0 +1,133 @@
+from .models import Constellation, ConstellationStar
+
+
+def new_rows() -> dict[str, list[dict]]:
+    return {"constellations": [], "stars": [], "connections": []}
+
+
+def merge_rows(rows: dict[str, list[dict]], more: dict[str, list[dict]]) -> dict[str, list[dict]]:
+    return {table: rows[table] + more[table] for table in rows}
+
+
+def group_rows(rows: dict[str, list[dict]]) -> tuple[dict[int, list[dict]], dict[int, list[str]]]:
+    # Star rows by constellation id and connected designations by star id
+    stars_by_constellation: dict[int, list[dict]] = {}
+    for star in rows["stars"]:
+        stars_by_constellation.setdefault(star["constellation_id"], []).append(star)
+    connections_by_star: dict[int, list[str]] = {}
+    for connection in rows["connections"]:
+        connections_by_star.setdefault(connection["star_id"], []).append(connection["connected_star_id"])
+    return stars_by_constellation, connections_by_star
+
+
+def star_designations(rows: dict[str, list[dict]], indexes: list[int] | None = None) -> list[str]:
+    # Every designation the constellations use, their own stars and the ones they connect to
+    stars_by_constellation, connections_by_star = group_rows(rows)
+    constellations = rows["constellations"]
+    designations = []
+    for constellation in (constellations if indexes is None else [constellations[i] for i in indexes]):
+        for star in stars_by_constellation.get(constellation["id"], []):
+            designations.append(star["ext_id"])
+            designations.extend(connections_by_star.get(star["id"], []))
+    return list(dict.fromkeys(designations))
+
+
+def to_constellations(
+    rows: dict[str, list[dict]], indexes: list[int] | None = None, positions: dict[str, tuple] | None = None
+) -> list[Constellation]:
+    """
+    Builds the nested Constellation models from the rows of the three tables
+
+    Parameters:
+        rows: {'constellations', 'stars', 'connections'}, the rows as the database returns them
+        indexes: Which constellation rows to build, all of them if None
+        positions: (x, y, z) by designation, set on the stars when given
+
+    Returns:
+        The constellations, in the order of indexes
+    """
+    stars_by_constellation, connections_by_star = group_rows(rows)
+    constellations = rows["constellations"]
+    return [
+        Constellation(
+            id=constellation["id"],
+            name=constellation["name"],
+            ra=constellation["ra"],
+            dec=constellation["dec"],
+            dist=constellation["dist"],
+            stars=[
+                ConstellationStar(
+                    ext_id=star["ext_id"],
+                    connected_stars=connections_by_star.get(star["id"], []),
+                    **star_position(positions, star["ext_id"]),
+                )
+                for star in stars_by_constellation.get(constellation["id"], [])
+            ],
+        )
+        for constellation in (constellations if indexes is None else [constellations[i] for i in indexes])
+    ]
+
+
+def star_position(positions: dict[str, tuple] | None, designation: str) -> dict:
+    if positions is None or designation not in positions:
+        return {}
+    x, y, z = positions[designation]
+    return {"x": x, "y": y, "z": z}
+
+
+def to_compact(
+    rows: dict[str, list[dict]], indexes: list[int] | None = None, positions: dict[str, tuple] | None = None
+) -> dict:
+    """
+    Encodes constellations as one table of star designations plus integer edges, straight from the rows
+
+    Every designation appears once in 'star_ids'. Each constellation lists its stars as indexes into that
+    table and its connections as a flat [from, to, from, to, ...] list of indexes.
+
+    Parameters:
+        rows: {'constellations', 'stars', 'connections'}, the rows as the database returns them
+        indexes: Which constellation rows to encode, all of them if None
+        positions: (x, y, z) by designation; when given, 'positions' holds one [x, y, z] (or None) per
+                   entry of 'star_ids'
+
+    Returns:
+        {'star_ids', 'constellations'}, plain JSON types with no models to validate
+
+    Example:
+        >>> to_compact(rows)
+        {'star_ids': ['Gaia DR3 1', 'Gaia DR3 2'], 'constellations': [{'id': 3, ..., 'stars': [0, 1], 'edges': [0, 1]}]}
+    """
+    stars_by_constellation, connections_by_star = group_rows(rows)
+    star_ids: dict[str, int] = {}
+
+    def star_index(ext_id: str) -> int:
+        index = star_ids.get(ext_id)
+        if index is None:
+            index = star_ids[ext_id] = len(star_ids)
+        return index
+
+    constellations = rows["constellations"]
+    encoded = []
+    for constellation in (constellations if indexes is None else [constellations[i] for i in indexes]):
+        stars = []
+        edges = []
+        for star in stars_by_constellation.get(constellation["id"], []):
+            start = star_index(star["ext_id"])
+            stars.append(start)
+            for connected_star_id in connections_by_star.get(star["id"], []):
+                edges.append(start)
+                edges.append(star_index(connected_star_id))
+        encoded.append({
+            "id": constellation["id"],
+            "name": constellation["name"],
+            "ra": constellation["ra"],
+            "dec": constellation["dec"],
+            "dist": constellation["dist"],
+            "stars": stars,
+            "edges": edges,
+        })
+
+    compact = {"star_ids": list(star_ids), "constellations": encoded}
+    if positions is not None:
+        compact["positions"] = [list(positions[ext_id]) if ext_id in positions else None for ext_id in star_ids]
+    return compact
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Literal
 
 class AuthResponse(BaseModel):
     user_id: int
@@ -12,6 +13,10 @@ class AuthRequest(BaseModel):
 class ConstellationStar(BaseModel):
     ext_id: str
     connected_stars: list[str]
+    # Relative to the observer, only when positions were asked for
+    x: float | None = None
+    y: float | None = None
+    z: float | None = None
 
 
 class Constellation(BaseModel):
@@ -31,6 +36,8 @@ class User(BaseModel):
 
 class ConstellationsResponse(BaseModel):
     constellations: list[Constellation]
+    # Changes whenever the user's constellations do, clients can skip redrawing on the same version
+    version: int = 0
 
 
 class ActiveConstellationsRequest(BaseModel):
@@ -38,6 +45,11 @@ class ActiveConstellationsRequest(BaseModel):
     ra: float
     dec: float
     dist: float
+    # Parsecs around the observer, the server's default when not given
+    radius: float | None = None
+    encoding: Literal["nested", "compact"] = "nested"
+    # Adds each star's x/y/z relative to the observer at ra/dec/dist
+    positions: bool = False
 
 
 class CreateConstellationRequest(BaseModel):
@@ -47,3 +59,23 @@ class CreateConstellationRequest(BaseModel):
 
 class CreateConstellationResponse(BaseModel):
     message: str
+
+
+class CompactConstellation(BaseModel):
+    ra: float
+    dec: float
+    dist: float
+    id: int
+    name: str
+    # Indexes into CompactConstellationsResponse.star_ids
+    stars: list[int]
+    # Connections as flat [from, to, from, to, ...] indexes into star_ids
+    edges: list[int]
+
+
+class CompactConstellationsResponse(BaseModel):
+    star_ids: list[str]
+    constellations: list[CompactConstellation]
+    # [x, y, z] per entry of star_ids, only when positions were asked for
+    positions: list[list[float] | None] | None = None
+    version: int = 0
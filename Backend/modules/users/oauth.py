@@ -1,8 +1,7 @@
-from supabase import create_client, Client, ClientOptions, AClient
+from .client import start_supabase, stop_supabase, get_auth_client
 from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import RedirectResponse, HTMLResponse
 from fastapi.security import OAuth2AuthorizationCodeBearer
-import os
 import json
 from dotenv import load_dotenv
 
@@ -12,19 +11,23 @@ language = "es"
 error = False
 error_message = ""
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
 active_websockets = {}
 
 app = FastAPI()
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(
-    flow_type="pkce"
-))
+
+@app.on_event("startup")
+async def startup():
+    await start_supabase()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await stop_supabase()
+
 
 @app.get("/login")
-def login(request: Request):
+async def login(request: Request):
 
     lang = request.query_params.get("lang")
 
@@ -35,7 +38,7 @@ def login(request: Request):
 
     try:
         redirect_url = "http://localhost:8000/callback"
-        response = supabase.auth.sign_in_with_oauth({
+        response = await get_auth_client().auth.sign_in_with_oauth({
             "provider": "google",
             "options": {
                 "redirect_to": redirect_url
@@ -56,17 +59,17 @@ async def logout ():
         print("WebSocket connection closed.")
 
     try:
-        supabase.auth.sign_out()
+        await get_auth_client().auth.sign_out()
     except:
         raise HTTPException(status_code=500, detail="Error during logout")
     
     return {"message": "Logout successful", "status": 200}
 
 @app.get("/callback")
-def callback(request: Request):
+async def callback(request: Request):
     try:
         code = request.query_params.get("code")
-        response = supabase.auth.exchange_code_for_session({
+        response = await get_auth_client().auth.exchange_code_for_session({
             "auth_code": code,
         })
 
@@ -0,0 +1,49 @@
+import os
+import numpy as np
+from scipy.spatial import cKDTree
+from ..stars.services import celestial_to_cartesian
+
+
+# Constellations saved within this distance of the observer, in parsecs, are active
+ACTIVE_RADIUS = float(os.getenv("CONSTELLATION_ACTIVE_RADIUS", "1.0"))
+
+
+def build_index(constellations: list[dict]) -> cKDTree | None:
+    if not constellations:
+        return None
+    x, y, z = celestial_to_cartesian(
+        np.array([constellation["ra"] for constellation in constellations], dtype=np.float64),
+        np.array([constellation["dec"] for constellation in constellations], dtype=np.float64),
+        np.array([constellation["dist"] for constellation in constellations], dtype=np.float64),
+    )
+    return cKDTree(np.column_stack((x, y, z)))
+
+
+def find_near(entry: dict, ra: float, dec: float, dist: float, radius: float | None = None) -> list[int]:
+    """
+    The constellations saved from around the observer's position
+
+    The KD-tree over the user's constellations is built on the first lookup and kept in the entry, a
+    new constellation replaces the entry and with it the tree.
+
+    Parameters:
+        entry: The user's {'rows', 'version'}, see cache.py
+        ra, dec, dist: The observer's position
+        radius: How far from the observer a constellation may have been saved, ACTIVE_RADIUS if None
+
+    Returns:
+        The indexes of the constellation rows within radius, nearest first
+
+    Example:
+        >>> find_near(entry, 185.18, 17.79, 18.3, radius=0.5)
+    """
+    if "tree" not in entry:
+        entry["tree"] = build_index(entry["rows"]["constellations"])
+    tree = entry["tree"]
+    if tree is None:
+        return []
+
+    position = np.array(celestial_to_cartesian(ra, dec, dist))
+    indexes = tree.query_ball_point(position, ACTIVE_RADIUS if radius is None else radius)
+    distances = np.linalg.norm(tree.data[indexes] - position, axis=1) if indexes else []
+    return [i for _, i in sorted(zip(distances, indexes))]
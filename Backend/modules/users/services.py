@@ -1,16 +1,16 @@
 from fastapi import HTTPException
 from hashlib import sha256
-from dotenv import load_dotenv
-from supabase import create_client, Client
-import os
+import asyncio
+from .client import get_supabase, get_auth_client
+from .cache import get_cached, store, record_write, state as cache_state
+from .proximity import find_near
+from .encoding import new_rows, to_constellations, to_compact, star_designations
+from ..stars.positions import resolve_positions
 from .models import *
 
-load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Ids per .in_() filter; they are sent in the URL, which PostgREST and its proxies limit in length
+IN_CHUNK_SIZE = 200
 
 
 # Funciones auxiliares
@@ -22,9 +22,23 @@ def check_password(sent: str, original: str):
     return hash_password(sent) == original
 
 async def createConstellation(user_id: int, constellation: Constellation) -> str:
+    """
+    Stores a constellation with its stars and their connections
+
+    Three inserts no matter the size of the constellation: the constellation, then every star in one
+    multi-row insert, then every connection in another.
+
+    Parameters:
+        user_id: The owner of the constellation
+        constellation: The constellation, its stars and the stars each one connects to
+
+    Returns:
+        A confirmation message
+    """
+    supabase = get_supabase()
     try:
         # Insertar constelación
-        constellation_response = supabase.table("constellations").insert({
+        constellation_response = await supabase.table("constellations").insert({
             "name": constellation.name,
             "user_id": user_id,
             "ra": constellation.ra,
@@ -32,140 +46,193 @@ async def createConstellation(user_id: int, constellation: Constellation) -> str
             "dist": constellation.dist,
         }).execute()
 
-        if constellation_response.error:
+        if not constellation_response.data:
             raise HTTPException(status_code=400, detail="Error creating constellation")
 
         constellation_id = constellation_response.data[0]["id"]
-
-        for star in constellation.stars:
-            # Insertar estrellas
-            star_response = supabase.table("stars").insert({
-                "ext_id": star.ext_id,
-                "constellation_id": constellation_id,
-            }).execute()
-
-            if star_response.error:
-                raise HTTPException(status_code=400, detail="Error creating stars")
-
-            star_id = star_response.data[0]["id"]
-
-            # Insertar conexiones entre estrellas
-            for connected_star_id in star.connected_stars:
-                connection_response = supabase.table("star_connections").insert({
-                    "star_id": star_id,
-                    "connected_star_id": connected_star_id,
-                }).execute()
-
-                if connection_response.error:
-                    raise HTTPException(status_code=400, detail="Error creating star connections")
-
+        rows = new_rows()
+        rows["constellations"] = constellation_response.data
+
+        try:
+            if constellation.stars:
+                # Insertar estrellas, todas en una sola petición
+                stars_response = await supabase.table("stars").insert([
+                    {
+                        "ext_id": star.ext_id,
+                        "constellation_id": constellation_id,
+                    }
+                    for star in constellation.stars
+                ]).execute()
+
+                if len(stars_response.data) != len(constellation.stars):
+                    raise HTTPException(status_code=400, detail="Error creating stars")
+                rows["stars"] = stars_response.data
+
+                # The rows come back in the order they were sent
+                connections = [
+                    {
+                        "star_id": star_row["id"],
+                        "connected_star_id": connected_star_id,
+                    }
+                    for star, star_row in zip(constellation.stars, stars_response.data)
+                    for connected_star_id in star.connected_stars
+                ]
+
+                if connections:
+                    # Insertar conexiones entre estrellas, todas en una sola petición
+                    connections_response = await supabase.table("star_connections").insert(connections).execute()
+
+                    if len(connections_response.data) != len(connections):
+                        raise HTTPException(status_code=400, detail="Error creating star connections")
+                    rows["connections"] = connections_response.data
+        except Exception:
+            # Without a transaction, a half-written constellation is removed instead of left behind. A
+            # failed cleanup is only logged: the caller needs the error that made the insert fail
+            try:
+                await supabase.table("stars").delete().eq("constellation_id", constellation_id).execute()
+                await supabase.table("constellations").delete().eq("id", constellation_id).execute()
+            except Exception as rollback_error:
+                print(f"Could not roll back constellation {constellation_id}: {rollback_error!r}")
+            raise
+
+        record_write(user_id, rows)
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
     return "Constellation created successfully"
 
 
-async def getAllConstellationsByUser() -> list[Constellation]:
+async def getAllConstellationsByUser(
+    access_token: str | None = None, compact: bool = False, observer: tuple[float, float, float] | None = None
+) -> tuple[list[Constellation] | dict, int]:
     try:
-        user_response = supabase.auth.get_user()
-        constellations_response = supabase.table("constellations").select("*").eq("user_id", user_response.user.id).execute()
-
-        if constellations_response.error:
-            raise HTTPException(status_code=500, detail="Error fetching constellations")
-
-        constellations = []
-        for constellation in constellations_response.data:
-            stars_response = supabase.table("stars").select("*").eq("constellation_id", constellation["id"]).execute()
-
-            if stars_response.error:
-                raise HTTPException(status_code=500, detail="Error fetching stars")
-
-            stars = []
-            for star in stars_response.data:
-                connections_response = supabase.table("star_connections").select("connected_star_id").eq("star_id", star["id"]).execute()
-
-                if connections_response.error:
-                    raise HTTPException(status_code=500, detail="Error fetching star connections")
-
-                connected_star_ids = [connection["connected_star_id"] for connection in connections_response.data]
-
-                stars.append(ConstellationStar(
-                    ext_id=star["ext_id"],
-                    connected_stars=connected_star_ids,
-                ))
-
-            constellations.append(Constellation(
-                id=constellation["id"],
-                name=constellation["name"],
-                ra=constellation["ra"],
-                dec=constellation["dec"],
-                dist=constellation["dist"],
-                stars=stars,
-            ))
-
-        return constellations
-
+        # The user of the request's own token; without one, the user who signed in through /login
+        user_response = await get_auth_client().auth.get_user(access_token)
+        entry = await loadConstellations(user_response.user.id)
+        positions = await starPositions(entry, None, observer) if observer is not None else None
+        return encodeConstellations(entry, None, compact, positions), entry["version"]
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def getActiveConstellationsByUser(user_id: int, ra: float, dec: float, dist: float) -> list[Constellation]:
+async def getActiveConstellationsByUser(
+    user_id: int, ra: float, dec: float, dist: float, radius: float | None = None, compact: bool = False,
+    with_positions: bool = False,
+) -> tuple[list[Constellation] | dict, int]:
     try:
-        constellations_response = supabase.table("constellations").select("*").match({
-            "user_id": user_id,
-            "ra": ra,
-            "dec": dec,
-            "dist": dist,
-        }).execute()
-
-        if constellations_response.error:
-            raise HTTPException(status_code=500, detail="Error fetching constellations")
-
-        constellations_data = constellations_response.data
-        constellations = []
-
-        for constellation in constellations_data:
-            stars = await fetchStarsAndConnections(constellation["id"])
-            constellations.append(Constellation(
-                id=constellation["id"],
-                name=constellation["name"],
-                ra=constellation["ra"],
-                dec=constellation["dec"],
-                dist=constellation["dist"],
-                stars=stars,
-            ))
-
-        return constellations
+        entry = await loadConstellations(user_id)
+        indexes = find_near(entry, ra, dec, dist, radius)
+        positions = await starPositions(entry, indexes, (ra, dec, dist)) if with_positions else None
+        return encodeConstellations(entry, indexes, compact, positions), entry["version"]
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def fetchStarsAndConnections(constellation_id: int) -> list[ConstellationStar]:
-    try:
-        # Obtener las estrellas de la constelación
-        stars_response = supabase.table("stars").select("*").eq("constellation_id", constellation_id).execute()
-
-        if stars_response.error:
-            raise HTTPException(status_code=500, detail="Error fetching stars")
-
-        stars_data = stars_response.data
-        stars = []
 
-        for star in stars_data:
-            # Obtener las conexiones de cada estrella
-            connections_response = supabase.table("star_connections").select("connected_star_id").eq("star_id", star["id"]).execute()
+async def loadConstellations(user_id: str | int) -> dict:
+    """
+    The rows of all the constellations of a user, from memory when cached
+
+    The cache is kept current by createConstellation, so it is only read from the database the first
+    time or after the user was evicted.
+
+    Parameters:
+        user_id: The owner of the constellations
+
+    Returns:
+        {'rows', 'version'}, the version changing whenever the constellations do
+
+    Example:
+        >>> entry = await loadConstellations(12)
+    """
+    entry = get_cached(user_id)
+    if entry is not None:
+        return entry
+
+    writes_before = cache_state["writes"]
+    constellations_response = await get_supabase().table("constellations").select("*").eq("user_id", user_id).execute()
+    rows = new_rows()
+    rows["constellations"] = constellations_response.data
+    rows["stars"], rows["connections"] = await fetchStarsAndConnections(
+        [constellation["id"] for constellation in rows["constellations"]]
+    )
+    return store(user_id, rows, writes_before)
+
+
+def encodeConstellations(
+    entry: dict, indexes: list[int] | None, compact: bool, positions: dict[str, tuple] | None = None
+) -> list[Constellation] | dict:
+    # The full list in either encoding is built once per version and kept in the cache entry; positions
+    # depend on the observer, so lists with them are built per request
+    if indexes is not None or positions is not None:
+        if compact:
+            return to_compact(entry["rows"], indexes, positions)
+        return to_constellations(entry["rows"], indexes, positions)
+    key = "compact" if compact else "constellations"
+    if key not in entry:
+        entry[key] = to_compact(entry["rows"]) if compact else to_constellations(entry["rows"])
+    return entry[key]
+
+
+async def starPositions(
+    entry: dict, indexes: list[int] | None, observer: tuple[float, float, float]
+) -> dict[str, tuple[float, float, float]]:
+    # Every star of the constellations resolved in one go, from the surroundings already loaded or from Gaia
+    ra, dec, dist = observer
+    return await resolve_positions(star_designations(entry["rows"], indexes), ra, dec, dist)
+
+
+async def fetchStarsAndConnections(constellation_ids: list[int]) -> tuple[list[dict], list[dict]]:
+    """
+    Loads the stars and connections of many constellations, a few queries per table
+
+    The ids go in the query string, so they are sent IN_CHUNK_SIZE at a time to keep the URLs short;
+    the chunks of a table are requested concurrently.
+
+    Parameters:
+        constellation_ids: The constellations to load
+
+    Returns:
+        The rows of the stars and of their star_connections
+
+    Example:
+        >>> stars, connections = await fetchStarsAndConnections([3, 7])
+        >>> connections[0]
+        {'star_id': 41, 'connected_star_id': 'Gaia DR3 4472832130942575872'}
+    """
+    if not constellation_ids:
+        return [], []
 
-            if connections_response.error:
-                raise HTTPException(status_code=500, detail="Error fetching star connections")
-
-            connected_star_ids = [conn["connected_star_id"] for conn in connections_response.data]
+    try:
+        # Obtener las estrellas de todas las constelaciones
+        stars_data = await selectIn("stars", "id, ext_id, constellation_id", "constellation_id", constellation_ids)
+        if not stars_data:
+            return [], []
 
-            stars.append(ConstellationStar(
-                ext_id=star["ext_id"],
-                connected_stars=connected_star_ids,
-            ))
+        # Obtener las conexiones de todas las estrellas
+        connections_data = await selectIn(
+            "star_connections", "star_id, connected_star_id", "star_id", [star["id"] for star in stars_data]
+        )
 
-        return stars
+        return stars_data, connections_data
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def selectIn(table: str, columns: str, column: str, values: list) -> list[dict]:
+    # One request per chunk of values, all in flight at once, rows in the order of the chunks
+    supabase = get_supabase()
+    responses = await asyncio.gather(*[
+        supabase.table(table).select(columns).in_(column, values[start:start + IN_CHUNK_SIZE]).execute()
+        for start in range(0, len(values), IN_CHUNK_SIZE)
+    ])
+    return [row for response in responses for row in response.data]
@@ -0,0 +1,93 @@
+import itertools
+import os
+import sys
+from types import SimpleNamespace
+import pytest
+
+# The app's modules are imported as top-level "modules", like `python -m modules.input.replay` does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeQuery:
+    # The few PostgREST builder calls the app makes, run against the fake's in-memory tables
+    def __init__(self, database, table):
+        self.database = database
+        self.table = table
+        self.operation = "select"
+        self.rows = None
+        self.filters = []
+
+    def select(self, columns="*"):
+        self.operation = "select"
+        return self
+
+    def insert(self, rows):
+        self.operation = "insert"
+        self.rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def delete(self):
+        self.operation = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, [value]))
+        return self
+
+    def in_(self, column, values):
+        self.filters.append((column, list(values)))
+        return self
+
+    def matches(self, row):
+        # Filters travel as text in the URL, so 7 and "7" are the same value
+        return all(str(row.get(column)) in map(str, values) for column, values in self.filters)
+
+    async def execute(self):
+        self.database.calls.append((self.table, self.operation, self.filters))
+        if (self.table, self.operation) in self.database.failures:
+            raise RuntimeError(f"{self.operation} on {self.table} failed")
+        rows = self.database.tables.setdefault(self.table, [])
+        if self.operation == "insert":
+            inserted = [{"id": next(self.database.ids), **row} for row in self.rows]
+            rows.extend(inserted)
+            return SimpleNamespace(data=inserted)
+        if self.operation == "delete":
+            deleted = [row for row in rows if self.matches(row)]
+            self.database.tables[self.table] = [row for row in rows if not self.matches(row)]
+            return SimpleNamespace(data=deleted)
+        return SimpleNamespace(data=[dict(row) for row in rows if self.matches(row)])
+
+
+class FakeAuth:
+    def __init__(self):
+        # access token -> user id; None is the user signed in through the OAuth flow
+        self.users = {}
+
+    async def get_user(self, jwt=None):
+        return SimpleNamespace(user=SimpleNamespace(id=self.users[jwt]))
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables = {}
+        self.auth = FakeAuth()
+        self.ids = itertools.count(1)
+        # (table, operation) pairs that raise, to exercise the error paths
+        self.failures = set()
+        self.calls = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+@pytest.fixture
+def fake_supabase(monkeypatch):
+    # Imported here, the modules only resolve once sys.path is set above
+    from modules.users import services, cache
+
+    client = FakeSupabase()
+    monkeypatch.setattr(services, "get_supabase", lambda: client)
+    monkeypatch.setattr(services, "get_auth_client", lambda: client)
+    cache.cache.clear()
+    yield client
+    cache.cache.clear()
@@ -0,0 +1,106 @@
+import asyncio
+import numpy as np
+import pytest
+from modules.input import batching
+from modules.input.batching import run_batched
+from modules.input.models import FrameFormat
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    """
+    Stands in for the worker pool: detection takes the delay set per session, tracking is immediate
+
+    Returns the per-session delays in seconds and the hands of every feature pass.
+    """
+    delays = {}
+    passes = []
+
+    def detect(file_bytes, session_id, frame_format):
+        if file_bytes == b"bad":
+            raise ValueError("bad frame")
+        return {"left": {}, "right": {"landmark": np.zeros((21, 3)), "session": session_id}, "idle": False}
+
+    def track(session_id, detected, now):
+        return {"session": session_id, "now": now, "features": "gesture" in detected["right"]}
+
+    async def run_in_worker(session_id, fn, *args):
+        if fn is detect:
+            await asyncio.sleep(delays.get(session_id, 0.0))
+        return fn(*args)
+
+    def hand_features(left_hands, right_hands):
+        passes.append(sorted(hand["session"] for hand in right_hands))
+        for hand in right_hands:
+            hand["gesture"] = "none"
+
+    monkeypatch.setattr(batching, "detect_frame", detect)
+    monkeypatch.setattr(batching, "track_frame", track)
+    monkeypatch.setattr(batching, "run_in_worker", run_in_worker)
+    monkeypatch.setattr(batching, "hand_features", hand_features)
+    monkeypatch.setattr(batching, "BATCH_WINDOW_MS", 20.0)
+    monkeypatch.setattr(batching, "BATCH_SHARE_MS", 20.0)
+    monkeypatch.setattr(batching, "batch", {"items": [], "timer": None})
+    return delays, passes
+
+
+def send(session_id, now=0.0, data=b"frame"):
+    return asyncio.create_task(run_batched(session_id, data, FrameFormat(), now))
+
+
+def test_frames_of_a_batch_share_one_feature_pass(fake_pool):
+    delays, passes = fake_pool
+
+    async def scenario():
+        return await asyncio.gather(send("a", 1.0), send("b", 2.0), send("c", 3.0))
+
+    results = asyncio.run(scenario())
+
+    assert [result["session"] for result in results] == ["a", "b", "c"]
+    assert all(result["features"] for result in results)
+    assert passes == [["a", "b", "c"]]
+
+
+def test_slow_frame_does_not_hold_back_its_batch(fake_pool):
+    delays, passes = fake_pool
+    delays["slow"] = 0.5
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        slow = send("slow")
+        fast = send("fast")
+        start = loop.time()
+        await fast
+        fast_seconds = loop.time() - start
+        assert not slow.done()
+        await slow
+        return fast_seconds
+
+    fast_seconds = asyncio.run(scenario())
+
+    # The collection window plus the sharing deadline, far from the slow frame's 0.5 s
+    assert fast_seconds < 0.2
+    assert passes == [["fast"], ["slow"]]
+
+
+def test_full_batch_is_flushed_without_waiting_for_the_window(fake_pool, monkeypatch):
+    delays, passes = fake_pool
+    monkeypatch.setattr(batching, "BATCH_WINDOW_MS", 10_000.0)
+    monkeypatch.setattr(batching, "BATCH_MAX", 2)
+
+    async def scenario():
+        return await asyncio.wait_for(asyncio.gather(send("a"), send("b")), timeout=1)
+
+    assert [result["session"] for result in asyncio.run(scenario())] == ["a", "b"]
+
+
+def test_failed_frame_only_fails_itself(fake_pool):
+    delays, passes = fake_pool
+
+    async def scenario():
+        return await asyncio.gather(send("a", data=b"bad"), send("b"), return_exceptions=True)
+
+    bad, good = asyncio.run(scenario())
+
+    assert isinstance(bad, ValueError)
+    assert good["session"] == "b"
@@ -0,0 +1,33 @@
+import pytest
+from modules.exoplanets import catalog, galaxy_map
+from modules.exoplanets.galaxy_map import HEADER, build_galaxy_map, get_galaxy_map
+
+
+def snapshot(version, *hosts):
+    planets = {
+        f"{host} b": {"host_star": host, "ra": "10.0", "dec": str(i), "dist": "5.0"} for i, host in enumerate(hosts)
+    }
+    return {"version": version, "planets": planets}
+
+
+def test_version_follows_the_content_not_the_catalog_counter():
+    blob, first = build_galaxy_map(snapshot(1, "Sun", "Vega"))
+    same_blob, same = build_galaxy_map(snapshot(7, "Sun", "Vega"))
+    _, changed = build_galaxy_map(snapshot(7, "Sun", "Altair"))
+
+    assert same == first
+    assert same_blob == blob
+    assert changed != first
+    assert HEADER.unpack_from(blob)[2] == int(first[:8], 16)
+
+
+@pytest.mark.parametrize("catalog_version", [1, 2])
+def test_etag_and_version_survive_a_restart(monkeypatch, catalog_version):
+    monkeypatch.setattr(catalog, "catalog", snapshot(catalog_version, "Sun", "Vega"))
+    monkeypatch.setattr(galaxy_map, "galaxy_map", {"catalog_version": -1, "version": "", "blob": b"", "etag": ""})
+
+    built = get_galaxy_map()
+
+    _, content_hash = build_galaxy_map(snapshot(1, "Sun", "Vega"))
+    assert built["version"] == content_hash
+    assert built["etag"] == f'"galaxy-map-1-{content_hash}"'
@@ -0,0 +1,81 @@
+import pytest
+from modules.input.processor import (
+    step,
+    RIGHT_HAND_TRANSITIONS,
+    LEFT_HAND_TRANSITIONS,
+    CLICK_MS,
+    SELECT_MS,
+    SWITCH_MS,
+    MAX_FRAME_GAP_MS,
+)
+from modules.input.sessions import new_left_tracker, new_right_tracker
+
+
+def run(tracker, transitions, frames):
+    # frames: (timestamp in ms, gesture); returns (timestamp, action) for every frame with an action
+    actions = []
+    for now, gesture in frames:
+        action = step(tracker, gesture, now, transitions)
+        if action:
+            actions.append((now, action))
+    return actions
+
+
+def held(gesture, start, end, fps):
+    period = 1000 / fps
+    count = int((end - start) / period)
+    return [(start + i * period, gesture) for i in range(count + 1)]
+
+
+@pytest.mark.parametrize("fps", [10, 30, 60])
+def test_select_fires_after_the_same_time_at_any_frame_rate(fps):
+    actions = run(new_right_tracker(), RIGHT_HAND_TRANSITIONS, held("click", 0, 1500, fps))
+
+    first_select = next(now for now, action in actions if action == "select")
+    assert SELECT_MS <= first_select < SELECT_MS + 1000 / fps
+
+
+@pytest.mark.parametrize("fps", [10, 30])
+def test_short_hold_is_a_click(fps):
+    frames = held("click", 0, CLICK_MS + 100, fps) + [(CLICK_MS + 200, "none")]
+    actions = run(new_right_tracker(), RIGHT_HAND_TRANSITIONS, frames)
+
+    assert actions == [(CLICK_MS + 200, "click")]
+
+
+def test_releasing_a_selection_deselects():
+    frames = held("click", 0, SELECT_MS + 100, 30) + [(SELECT_MS + 200, "none")]
+    actions = run(new_right_tracker(), RIGHT_HAND_TRANSITIONS, frames)
+
+    assert actions[-1] == (SELECT_MS + 200, "deselect")
+
+
+def test_a_gap_longer_than_max_frame_gap_restarts_the_hold():
+    tracker = new_right_tracker()
+    gap_end = 600 + MAX_FRAME_GAP_MS + 50
+    frames = held("click", 0, 600, 30) + held("click", gap_end, gap_end + SELECT_MS - 100, 30)
+    actions = run(tracker, RIGHT_HAND_TRANSITIONS, frames)
+
+    # Without the gap the hold would have reached SELECT_MS long ago
+    assert "select" not in [action for _, action in actions]
+    assert tracker["since"] == gap_end
+
+
+def test_a_gap_within_max_frame_gap_keeps_the_hold():
+    frames = held("click", 0, 600, 30) + held("click", 600 + MAX_FRAME_GAP_MS - 50, SELECT_MS + 100, 30)
+    actions = run(new_right_tracker(), RIGHT_HAND_TRANSITIONS, frames)
+
+    assert "select" in [action for _, action in actions]
+
+
+@pytest.mark.parametrize("fps", [10, 30])
+def test_left_hand_switches_to_rotation_then_zoom(fps):
+    tracker = new_left_tracker()
+    frames = held("click", 0, SWITCH_MS + 200, fps) + held("none", SWITCH_MS + 300, 2 * SWITCH_MS + 500, fps)
+    actions = run(tracker, LEFT_HAND_TRANSITIONS, frames)
+
+    reference = next(now for now, action in actions if action == "reference")
+    zoom = next(now for now, action in actions if action == "zoom")
+    assert SWITCH_MS <= reference < SWITCH_MS + 1000 / fps
+    assert zoom >= SWITCH_MS + 300 + SWITCH_MS
+    assert tracker["label"] == "zoom"
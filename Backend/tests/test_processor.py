@@ -0,0 +1,25 @@
+import json
+import numpy as np
+from modules.input.processor import get_cursor, get_rotation, get_zoom, hand_features
+
+
+def test_degenerate_hand_gives_neutral_values():
+    # Every landmark on the same point: all the denominators are zero
+    landmark = np.full((21, 3), 0.5)
+
+    cursor = get_cursor(landmark)
+    dx, dy = get_rotation(landmark, [0.5, 0.5, 0.0])
+    zoom = get_zoom(landmark)
+
+    assert np.all(np.isfinite(cursor))
+    assert np.allclose(cursor, [0.5, 0.5])
+    assert (float(dx), float(dy)) == (0.0, 0.0)
+    assert float(zoom) == 0.0
+
+
+def test_degenerate_hand_features_serialize():
+    right = {"landmark": np.zeros((21, 3))}
+    left = {"landmark": np.zeros((21, 3))}
+    hand_features([left], [right])
+
+    json.dumps({"cursor": [float(v) for v in right["cursor"]], "zoom": float(left["zoom"])}, allow_nan=False)
@@ -0,0 +1,29 @@
+from modules.input.replay import same_output, diff_outputs, TOLERANCE
+
+
+def outputs():
+    return [
+        {"right_gesture": "none", "idle": True},
+        {"right_gesture": "pinch", "idle": False, "cursor": {"x": 0.25, "y": 0.5}, "zoom": 1.5},
+    ]
+
+
+def test_identical_outputs_have_no_diff():
+    golden = outputs()
+    got = outputs()
+    got[1]["cursor"]["x"] += TOLERANCE / 2
+
+    assert same_output(got[1], golden[1])
+    assert diff_outputs(got, golden) == []
+
+
+def test_differing_frames_are_reported():
+    golden = outputs()
+    got = outputs()
+    got[1]["right_gesture"] = "fist"
+    del got[1]["zoom"]
+
+    assert not same_output(got[1], golden[1])
+    lines = diff_outputs(got + [golden[0]], golden)
+    assert lines[0] == "frame count: got 3, golden has 2"
+    assert [line.split(":")[0] for line in lines[1:]] == ["frame 1"]
@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from modules.input import scheduler
+from modules.input.scheduler import schedule_frame
+
+
+@pytest.fixture(autouse=True)
+def empty_schedulers(monkeypatch):
+    monkeypatch.setattr(scheduler, "schedulers", {})
+    monkeypatch.setitem(scheduler.metrics, "dropped", 0)
+
+
+def test_frames_piling_up_behind_the_running_one_are_dropped():
+    async def scenario():
+        release = asyncio.Event()
+        ran = []
+
+        async def frame(name):
+            ran.append(name)
+            await release.wait()
+            return name
+
+        first = asyncio.create_task(schedule_frame("s", frame, 1))
+        await asyncio.sleep(0)
+        # 2 waits behind 1 and is replaced by 3 before 1 finishes
+        second = asyncio.create_task(schedule_frame("s", frame, 2))
+        await asyncio.sleep(0)
+        third = asyncio.create_task(schedule_frame("s", frame, 3))
+        # 2 is answered as dropped right away, while 1 is still running
+        assert (await second)[:2] == (None, True)
+        assert not first.done()
+
+        release.set()
+        return ran, (await first)[:2], (await third)[:2]
+
+    ran, first, third = asyncio.run(scenario())
+
+    assert ran == [1, 3]
+    assert first == (1, False)
+    assert third == (3, False)
+    assert scheduler.metrics["dropped"] == 1
+
+
+def test_sessions_do_not_drop_each_others_frames():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def frame(name):
+            await release.wait()
+            return name
+
+        tasks = [asyncio.create_task(schedule_frame(session_id, frame, session_id)) for session_id in "abc"]
+        await asyncio.sleep(0)
+        release.set()
+        return [(await task)[:2] for task in tasks]
+
+    assert asyncio.run(scenario()) == [("a", False), ("b", False), ("c", False)]
+    assert scheduler.metrics["dropped"] == 0
+
+
+def test_errors_reach_the_frame_and_the_session_keeps_running():
+    async def scenario():
+        async def failing():
+            raise ValueError("bad frame")
+
+        async def working():
+            return "ok"
+
+        with pytest.raises(ValueError):
+            await schedule_frame("s", failing)
+        return (await schedule_frame("s", working))[:2]
+
+    assert asyncio.run(scenario()) == ("ok", False)
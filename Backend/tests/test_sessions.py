@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+import pytest
+from fastapi import HTTPException
+from modules.input import sessions
+from modules.input.sessions import locked_session, get_session
+
+
+class FakeHands:
+    def __init__(self, fail_reset=False):
+        self.fail_reset = fail_reset
+        self.resets = 0
+
+    def reset(self):
+        if self.fail_reset:
+            raise TimeoutError("inference process timed out")
+        self.resets += 1
+
+
+@pytest.fixture(autouse=True)
+def empty_pool(monkeypatch):
+    monkeypatch.setattr(sessions, "sessions", OrderedDict())
+    monkeypatch.setattr(sessions, "free_hands", [])
+    monkeypatch.setattr(sessions, "hands_created", 0)
+    monkeypatch.setattr(sessions, "HANDS_POOL_SIZE", 1)
+
+
+def test_slow_creation_does_not_block_other_lookups(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_new_hands():
+        started.set()
+        release.wait(5)
+        return FakeHands()
+
+    monkeypatch.setattr(sessions, "new_hands", slow_new_hands)
+
+    def frame():
+        with locked_session("a"):
+            pass
+
+    thread = threading.Thread(target=frame)
+    thread.start()
+    assert started.wait(5)
+
+    # sessions_lock is free while "a" waits for its instance
+    assert sessions.sessions_lock.acquire(timeout=1)
+    sessions.sessions_lock.release()
+    with locked_session("b", needs_hands=False) as session:
+        assert session["hands"] is None
+
+    release.set()
+    thread.join(5)
+    assert isinstance(sessions.sessions["a"]["hands"], FakeHands)
+
+
+def test_failed_reset_gives_the_slot_back(monkeypatch):
+    monkeypatch.setattr(sessions, "new_hands", FakeHands)
+    sessions.hands_created = 1
+    sessions.free_hands.append(FakeHands(fail_reset=True))
+
+    with pytest.raises(TimeoutError):
+        with locked_session("a"):
+            pass
+
+    assert sessions.hands_created == 0
+    with locked_session("a") as session:
+        assert isinstance(session["hands"], FakeHands)
+    assert sessions.hands_created == 1
+
+
+def test_full_pool_takes_the_instance_of_the_least_recent_idle_session(monkeypatch):
+    monkeypatch.setattr(sessions, "new_hands", FakeHands)
+    with locked_session("a") as session:
+        hands = session["hands"]
+
+    with locked_session("b") as session:
+        assert session["hands"] is hands
+        assert hands.resets == 1
+    assert "a" not in sessions.sessions
+
+    # "b" is busy, nothing can be taken
+    with locked_session("b"):
+        thread_error = []
+
+        def frame():
+            try:
+                with locked_session("c"):
+                    pass
+            except HTTPException as e:
+                thread_error.append(e.status_code)
+
+        thread = threading.Thread(target=frame)
+        thread.start()
+        thread.join(5)
+    assert thread_error == [503]
+    assert get_session("b")["hands"] is hands
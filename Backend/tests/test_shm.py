@@ -0,0 +1,102 @@
+import queue
+import threading
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from modules.input import shm
+from modules.input.shm import FrameRing, collect_results, run_remote
+
+SLOTS = 2
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    """
+    The backend with its ring, queues and collector, and a thread in place of the inference process
+
+    Returns the jobs and results queues and a set of job ids the fake process holds on to until released.
+    """
+    ring = FrameRing(SLOTS, 64)
+    free_slots = queue.Queue()
+    for slot in range(SLOTS):
+        free_slots.put(slot)
+    jobs = queue.Queue()
+    results = queue.Queue()
+    held = {}
+
+    def process():
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            job_id, handle, slot, shape, static_image_mode = job
+            if handle in held:
+                held[handle].wait()
+            results.put((job_id, ([slot], [])))
+
+    monkeypatch.setattr(shm, "INFERENCE_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(shm, "backend", {
+        "ring": ring,
+        "free_slots": free_slots,
+        "processes": [],
+        "jobs": [jobs],
+        "results": results,
+        "collector": None,
+        "pending": {},
+    })
+    threads = [threading.Thread(target=process), threading.Thread(target=collect_results, args=(results,))]
+    for thread in threads:
+        thread.start()
+
+    yield held
+
+    jobs.put(None)
+    results.put(None)
+    for event in held.values():
+        event.set()
+    for thread in threads:
+        thread.join(timeout=2)
+    ring.close(unlink=True)
+
+
+def frame():
+    return np.zeros((4, 4, 3), dtype=np.uint8)
+
+
+def test_slot_is_returned_after_each_frame(fake_backend):
+    for _ in range(SLOTS * 3):
+        landmarks, handedness = run_remote(1, frame())
+
+    assert shm.backend["free_slots"].qsize() == SLOTS
+    assert shm.backend["pending"] == {}
+
+
+def test_timed_out_frame_returns_its_slot_when_the_late_result_arrives(fake_backend):
+    fake_backend[1] = threading.Event()
+
+    with pytest.raises(HTTPException) as error:
+        run_remote(1, frame())
+    assert error.value.status_code == 504
+    # The process may still read the slot, it is not reused yet
+    assert shm.backend["free_slots"].qsize() == SLOTS - 1
+
+    fake_backend[1].set()
+    run_remote(2, frame())
+
+    for _ in range(20):
+        if shm.backend["free_slots"].qsize() == SLOTS:
+            break
+        threading.Event().wait(0.05)
+    assert shm.backend["free_slots"].qsize() == SLOTS
+    assert shm.backend["pending"] == {}
+
+
+def test_more_timeouts_than_slots_do_not_exhaust_the_ring(fake_backend):
+    for _ in range(SLOTS + 1):
+        fake_backend[1] = threading.Event()
+        with pytest.raises(HTTPException):
+            run_remote(1, frame())
+        fake_backend[1].set()
+
+    landmarks, handedness = run_remote(2, frame())
+    assert landmarks in ([0], [1])
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import pytest
+from modules.stars import positions
+from modules.stars.positions import remember_positions, remember_missing, known_positions, resolve_positions
+
+
+@pytest.fixture(autouse=True)
+def empty_index(monkeypatch):
+    monkeypatch.setattr(positions, "positions", {})
+    monkeypatch.setattr(positions, "missing", {})
+
+
+def remember(*designations):
+    remember_positions(designations, [10.0] * len(designations), [20.0] * len(designations), [5.0] * len(designations))
+
+
+def test_oldest_are_dropped_and_missing_ones_first(monkeypatch):
+    monkeypatch.setattr(positions, "POSITION_INDEX_SIZE", 3)
+    remember("a", "b")
+    remember_missing(["x"])
+
+    remember("c")
+
+    assert list(positions.positions) == ["a", "b", "c"]
+    assert positions.missing == {}
+
+    remember("d")
+
+    assert list(positions.positions) == ["b", "c", "d"]
+
+
+def test_missing_stars_are_looked_up_again_after_their_ttl(monkeypatch):
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(positions.time, "monotonic", lambda: clock["now"])
+    remember("a")
+    remember_missing(["x"])
+
+    assert known_positions(["a", "x", "y"]) == ({"a": (10.0, 20.0, 5.0)}, ["y"])
+
+    clock["now"] += positions.MISSING_POSITION_TTL + 1
+
+    assert known_positions(["x"]) == ({}, ["x"])
+
+
+def test_resolve_only_queries_unknown_stars(monkeypatch):
+    queried = []
+
+    def query(designations):
+        queried.append(designations)
+        remember(*[designation for designation in designations if designation != "gone"])
+        remember_missing(["gone"])
+
+    monkeypatch.setattr(positions, "query_positions", query)
+    remember("a")
+
+    first = asyncio.run(resolve_positions(["a", "b", "gone", "b"], 10.0, 20.0, 5.0))
+    second = asyncio.run(resolve_positions(["a", "b", "gone"], 10.0, 20.0, 5.0))
+
+    assert queried == [["b", "gone"]]
+    assert set(first) == {"a", "b"}
+    assert first == second
+    assert first["a"] == pytest.approx((0.0, 0.0, 0.0), abs=1e-9)
+
+
+def test_concurrent_loads_stay_within_the_bound(monkeypatch):
+    monkeypatch.setattr(positions, "POSITION_INDEX_SIZE", 50)
+
+    def fill(prefix):
+        for i in range(500):
+            remember(f"{prefix}{i}")
+            remember_missing([f"{prefix}-missing{i}"])
+
+    threads = [threading.Thread(target=fill, args=(prefix,)) for prefix in "abcd"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(positions.positions) + len(positions.missing) == 50
@@ -0,0 +1,70 @@
+import pytest
+from modules.users import cache
+from modules.users.cache import get_cached, store, record_write
+from modules.users.encoding import new_rows
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(cache, "cache", type(cache.cache)())
+    monkeypatch.setitem(cache.state, "writes", 0)
+
+
+def rows(*names):
+    loaded = new_rows()
+    loaded["constellations"] = [{"id": i, "name": name} for i, name in enumerate(names)]
+    return loaded
+
+
+def test_int_and_string_ids_share_an_entry():
+    store("7", rows("Orion"), cache.state["writes"])
+
+    assert get_cached(7) is get_cached("7")
+
+
+def test_write_merges_into_the_cached_rows_with_a_new_version():
+    entry = store(7, rows("Orion"), cache.state["writes"])
+
+    record_write("7", rows("Lyra"))
+
+    updated = get_cached(7)
+    assert [row["name"] for row in updated["rows"]["constellations"]] == ["Orion", "Lyra"]
+    assert updated["version"] > entry["version"]
+    # Views built from the old rows are not carried over
+    assert "constellations" not in updated
+
+
+def test_write_for_an_uncached_user_only_counts():
+    record_write(7, rows("Lyra"))
+
+    assert get_cached(7) is None
+    assert cache.state["writes"] == 1
+
+
+def test_load_that_raced_a_write_is_not_cached():
+    writes_before = cache.state["writes"]
+    record_write(7, rows("Lyra"))
+
+    entry = store(7, rows("Orion"), writes_before)
+
+    assert entry["rows"]["constellations"][0]["name"] == "Orion"
+    assert get_cached(7) is None
+
+
+def test_least_recently_used_user_is_evicted(monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_SIZE", 2)
+    store(1, rows("A"), 0)
+    store(2, rows("B"), 0)
+    get_cached(1)
+
+    store(3, rows("C"), 0)
+
+    assert get_cached(2) is None
+    assert get_cached(1) is not None
+    assert get_cached(3) is not None
+
+
+def test_versions_keep_growing():
+    versions = [store(i, rows("A"), 0)["version"] for i in range(5)]
+
+    assert versions == sorted(set(versions))
@@ -0,0 +1,80 @@
+from modules.users.encoding import new_rows, to_compact, to_constellations, star_designations
+from modules.users.models import CompactConstellationsResponse
+
+
+def rows():
+    # Two constellations sharing the star "B"; "D" is only reached through a connection
+    loaded = new_rows()
+    loaded["constellations"] = [
+        {"id": 1, "name": "One", "ra": 1.0, "dec": 2.0, "dist": 3.0},
+        {"id": 2, "name": "Two", "ra": 4.0, "dec": 5.0, "dist": 6.0},
+    ]
+    loaded["stars"] = [
+        {"id": 10, "ext_id": "A", "constellation_id": 1},
+        {"id": 11, "ext_id": "B", "constellation_id": 1},
+        {"id": 20, "ext_id": "B", "constellation_id": 2},
+        {"id": 21, "ext_id": "C", "constellation_id": 2},
+    ]
+    loaded["connections"] = [
+        {"star_id": 10, "connected_star_id": "B"},
+        {"star_id": 20, "connected_star_id": "C"},
+        {"star_id": 21, "connected_star_id": "D"},
+    ]
+    return loaded
+
+
+def decode(compact):
+    # Back to designations, to compare with the nested encoding
+    star_ids = compact["star_ids"]
+    return [
+        (
+            constellation["name"],
+            [star_ids[i] for i in constellation["stars"]],
+            [(star_ids[a], star_ids[b]) for a, b in zip(constellation["edges"][::2], constellation["edges"][1::2])],
+        )
+        for constellation in compact["constellations"]
+    ]
+
+
+def test_every_designation_appears_once():
+    compact = to_compact(rows())
+
+    assert compact["star_ids"] == ["A", "B", "C", "D"]
+
+
+def test_decodes_to_the_nested_encoding():
+    loaded = rows()
+
+    nested = [
+        (
+            constellation.name,
+            [star.ext_id for star in constellation.stars],
+            [(star.ext_id, connected) for star in constellation.stars for connected in star.connected_stars],
+        )
+        for constellation in to_constellations(loaded)
+    ]
+
+    assert decode(to_compact(loaded)) == nested
+
+
+def test_indexes_select_and_order_constellations():
+    compact = to_compact(rows(), indexes=[1])
+
+    assert decode(compact) == [("Two", ["B", "C"], [("B", "C"), ("C", "D")])]
+    assert compact["star_ids"] == ["B", "C", "D"]
+    assert star_designations(rows(), [1]) == ["B", "C", "D"]
+
+
+def test_positions_follow_star_ids():
+    compact = to_compact(rows(), positions={"A": (1.0, 2.0, 3.0), "C": (4.0, 5.0, 6.0)})
+
+    assert compact["positions"] == [[1.0, 2.0, 3.0], None, [4.0, 5.0, 6.0], None]
+    assert "positions" not in to_compact(rows())
+
+
+def test_matches_the_declared_response_model():
+    compact = to_compact(rows(), positions={"A": (1.0, 2.0, 3.0)})
+
+    response = CompactConstellationsResponse(**compact, version=5)
+
+    assert response.model_dump() == {**compact, "version": 5}
@@ -0,0 +1,61 @@
+import numpy as np
+from modules.stars.services import celestial_to_cartesian
+from modules.users.proximity import find_near, ACTIVE_RADIUS
+from modules.users.encoding import new_rows
+
+
+def entry(*positions):
+    rows = new_rows()
+    rows["constellations"] = [
+        {"id": i, "name": f"C{i}", "ra": ra, "dec": dec, "dist": dist} for i, (ra, dec, dist) in enumerate(positions)
+    ]
+    return {"rows": rows, "version": 1}
+
+
+def brute_force(cached, ra, dec, dist, radius):
+    # Every constellation checked one by one, the way the lookup worked before the KD-tree
+    origin = np.array(celestial_to_cartesian(ra, dec, dist))
+    found = []
+    for i, row in enumerate(cached["rows"]["constellations"]):
+        distance = np.linalg.norm(np.array(celestial_to_cartesian(row["ra"], row["dec"], row["dist"])) - origin)
+        if distance <= radius:
+            found.append((distance, i))
+    return [i for _, i in sorted(found)]
+
+
+def test_nearest_first_and_outside_radius_left_out():
+    cached = entry((10.0, 20.0, 30.5), (10.0, 20.0, 30.1), (10.0, 20.0, 45.0), (190.0, -20.0, 30.0))
+
+    assert find_near(cached, 10.0, 20.0, 30.0, radius=1.0) == [1, 0]
+
+
+def test_default_radius():
+    cached = entry((10.0, 20.0, 30.0 + ACTIVE_RADIUS / 2), (10.0, 20.0, 30.0 + ACTIVE_RADIUS * 2))
+
+    assert find_near(cached, 10.0, 20.0, 30.0) == [0]
+
+
+def test_matches_a_linear_scan():
+    rng = np.random.default_rng(3)
+    positions = list(zip(rng.uniform(0, 360, 500), rng.uniform(-90, 90, 500), rng.uniform(1, 20, 500)))
+    cached = entry(*positions)
+
+    for ra, dec, dist in positions[:20]:
+        assert find_near(cached, ra, dec, dist, radius=3.0) == brute_force(cached, ra, dec, dist, 3.0)
+
+
+def test_no_constellations():
+    cached = entry()
+
+    assert find_near(cached, 10.0, 20.0, 30.0) == []
+    assert cached["tree"] is None
+
+
+def test_tree_is_built_once_per_entry():
+    cached = entry((10.0, 20.0, 30.0))
+    find_near(cached, 10.0, 20.0, 30.0)
+    tree = cached["tree"]
+
+    find_near(cached, 50.0, 20.0, 30.0)
+
+    assert cached["tree"] is tree
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from modules.users.models import Constellation, ConstellationStar
+from modules.users.services import (
+    createConstellation,
+    fetchStarsAndConnections,
+    getAllConstellationsByUser,
+    getActiveConstellationsByUser,
+)
+
+
+def constellation(name="Orion", stars=3):
+    designations = [f"Gaia DR3 {i}" for i in range(1, stars + 1)]
+    return Constellation(
+        id=0,
+        name=name,
+        ra=10.0,
+        dec=20.0,
+        dist=30.0,
+        stars=[
+            ConstellationStar(ext_id=designation, connected_stars=designations[i + 1:i + 2])
+            for i, designation in enumerate(designations)
+        ],
+    )
+
+
+def test_failed_insert_is_rolled_back(fake_supabase):
+    fake_supabase.failures.add(("star_connections", "insert"))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(createConstellation(7, constellation()))
+
+    assert "star_connections failed" in error.value.detail
+    assert fake_supabase.tables["constellations"] == []
+    assert fake_supabase.tables["stars"] == []
+
+
+def test_failed_rollback_keeps_the_original_error(fake_supabase, capsys):
+    fake_supabase.failures.update({("star_connections", "insert"), ("stars", "delete")})
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(createConstellation(7, constellation()))
+
+    assert "star_connections failed" in error.value.detail
+    assert "Could not roll back" in capsys.readouterr().out
+
+
+def test_in_filters_are_chunked(fake_supabase):
+    fake_supabase.tables["stars"] = [
+        {"id": 1000 + i, "ext_id": f"Gaia DR3 {i}", "constellation_id": i} for i in range(450)
+    ]
+    fake_supabase.tables["star_connections"] = [{"star_id": 1000 + i, "connected_star_id": "Gaia DR3 0"} for i in range(450)]
+
+    stars, connections = asyncio.run(fetchStarsAndConnections(list(range(450))))
+
+    assert len(stars) == 450
+    assert len(connections) == 450
+    sizes = [len(filters[0][1]) for table, operation, filters in fake_supabase.calls]
+    assert sizes == [200, 200, 50, 200, 200, 50]
+
+
+def test_created_constellation_is_listed_from_the_cache(fake_supabase):
+    fake_supabase.auth.users["token-7"] = "7"
+    asyncio.run(createConstellation(7, constellation("Orion")))
+    # The first list loads the user into the cache, under the auth user's id
+    constellations, first_version = asyncio.run(getAllConstellationsByUser("token-7"))
+    assert [c.name for c in constellations] == ["Orion"]
+
+    asyncio.run(createConstellation(7, constellation("Lyra")))
+    reads = len(fake_supabase.calls)
+    constellations, version = asyncio.run(getAllConstellationsByUser("token-7"))
+    active, active_version = asyncio.run(getActiveConstellationsByUser(7, 10.0, 20.0, 30.0))
+
+    assert [c.name for c in constellations] == ["Orion", "Lyra"]
+    assert [star.connected_stars for star in constellations[1].stars] == [["Gaia DR3 2"], ["Gaia DR3 3"], []]
+    assert len(fake_supabase.calls) == reads
+    assert version > first_version
+    assert active_version == version
+    assert {c.name for c in active} == {"Orion", "Lyra"}